@@ -2,15 +2,23 @@
 API dependencies for authentication and database sessions.
 """
 
-from typing import Optional
-from fastapi import Depends, HTTPException, status
+from typing import List, Optional
+from fastapi import Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.datastructures import UploadFile
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
 from app.models.user import User
+from app.core.config import settings
 from app.core.security import decode_token
-from app.core.exceptions import UnauthorizedException, ForbiddenException
+from app.core.exceptions import (
+    BadRequestException,
+    UnauthorizedException,
+    ForbiddenException,
+    PayloadTooLargeException,
+    UnsupportedMediaTypeException
+)
 
 
 # HTTP Bearer token scheme
@@ -114,3 +122,104 @@ def get_optional_user(
         return user
     except Exception:
         return None
+
+
+# OpenAPI description of request bodies accepted by get_image_uploads
+IMAGE_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "images": {"type": "array", "items": {"type": "string", "format": "binary"}}
+                    }
+                }
+            },
+            "application/octet-stream": {
+                "schema": {"type": "string", "format": "binary"}
+            }
+        }
+    }
+}
+
+
+async def _read_body(request: Request, max_bytes: int, too_large: str) -> bytes:
+    """Stream the request body, stopping as soon as it exceeds max_bytes."""
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_bytes:
+            raise PayloadTooLargeException(too_large)
+    
+    return bytes(body)
+
+
+async def get_image_uploads(request: Request) -> List[bytes]:
+    """
+    Dependency to read raw image bytes from a binary request body.
+    Accepts multipart/form-data (any number of file fields) or a single
+    image as application/octet-stream (or image/*), bounded by MAX_UPLOAD_SIZE_MB.
+    
+    Args:
+        request: Incoming request
+        
+    Returns:
+        List of raw image file bytes, in upload order
+        
+    Raises:
+        PayloadTooLargeException: If the body exceeds MAX_UPLOAD_SIZE_MB
+        UnsupportedMediaTypeException: If the body or a file has an unsupported type
+        BadRequestException: If no image was uploaded
+    """
+    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+    too_large = f"Upload exceeds {settings.MAX_UPLOAD_SIZE_MB} MB"
+    
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise PayloadTooLargeException(too_large)
+    
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    if content_type == "application/octet-stream" or content_type.startswith("image/"):
+        if content_type.startswith("image/") and content_type not in settings.ALLOWED_IMAGE_TYPES:
+            raise UnsupportedMediaTypeException(f"Unsupported image type: {content_type}")
+        
+        body = await _read_body(request, max_bytes, too_large)
+        if not body:
+            raise BadRequestException("Empty request body")
+        
+        return [body]
+    
+    if content_type != "multipart/form-data":
+        raise UnsupportedMediaTypeException(
+            "Use multipart/form-data or application/octet-stream for image uploads"
+        )
+    
+    # Bound the raw body before parsing: chunked requests carry no Content-Length
+    body = await _read_body(request, max_bytes, too_large)
+    
+    async def receive() -> dict:
+        return {"type": "http.request", "body": body, "more_body": False}
+    
+    form = await Request(request.scope, receive).form()
+    images: List[bytes] = []
+    
+    try:
+        for _, value in form.multi_items():
+            if not isinstance(value, UploadFile):
+                continue
+            
+            if value.content_type and value.content_type not in settings.ALLOWED_IMAGE_TYPES \
+                    and value.content_type != "application/octet-stream":
+                raise UnsupportedMediaTypeException(f"Unsupported image type: {value.content_type}")
+            
+            images.append(await value.read())
+    finally:
+        await form.close()
+    
+    if not images:
+        raise BadRequestException("No image file uploaded")
+    
+    return images
@@ -6,9 +6,9 @@ Endpoints for attendance submission, history, and statistics.
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 
-from app.api.deps import get_current_user, get_db
+from app.api.deps import IMAGE_UPLOAD_OPENAPI, get_current_user, get_db, get_image_uploads
 from app.models.user import User
 from app.schemas.absensi import (
     AbsensiSubmitRequest,
@@ -20,14 +20,15 @@ from app.schemas.absensi import (
 from app.schemas.common import PaginatedResponse
 from app.services.attendance_service import attendance_service
 from app.services.face_recognition_service import face_service
-from app.utils.image_processing import decode_base64_image
+from app.services.recognition_executor import recognition_executor
+from app.utils.image_processing import decode_base64_data, load_image
 from app.core.exceptions import BadRequestException, DuplicateException
 
 router = APIRouter(prefix="/absensi", tags=["Attendance"])
 
 
 @router.post("/submit", response_model=AbsensiResponse)
-async def submit_attendance(
+def submit_attendance(
     request: AbsensiSubmitRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -36,6 +37,33 @@ async def submit_attendance(
     Submit attendance with face recognition.
     User must have registered face first.
     """
+    try:
+        image_data = decode_base64_data(request.image_base64)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid base64 image")
+    
+    return _submit_attendance_image(current_user, image_data, db)
+
+
+@router.post("/submit/upload", response_model=AbsensiResponse, openapi_extra=IMAGE_UPLOAD_OPENAPI)
+def submit_attendance_upload(
+    images: List[bytes] = Depends(get_image_uploads),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Same as /absensi/submit, but the image is sent as raw bytes
+    (multipart/form-data or application/octet-stream) instead of base64 JSON.
+    """
+    return _submit_attendance_image(current_user, images[0], db)
+
+
+def _submit_attendance_image(
+    current_user: User,
+    image_data: bytes,
+    db: Session
+) -> AbsensiResponse:
+    """Verify the user's face in raw image bytes and record attendance (shared by /submit endpoints)."""
     # Check if user has face registered
     if not current_user.has_face:
         raise HTTPException(
@@ -44,13 +72,11 @@ async def submit_attendance(
         )
     
     try:
-        # Decode image
-        image = decode_base64_image(request.image_base64)
-        
         # Get user's face encodings
         from app.models.face_encoding import FaceEncoding
         face_encodings_db = db.query(FaceEncoding).filter(
-            FaceEncoding.user_id == current_user.id
+            FaceEncoding.user_id == current_user.id,
+            FaceEncoding.model == face_service.engine.name
         ).all()
         
         if not face_encodings_db:
@@ -62,12 +88,14 @@ async def submit_attendance(
             for fe in face_encodings_db
         ]
         
-        # Get face encoding from submitted image
-        face_encoding = face_service.encode_face(image)
+        # Get face encoding from submitted image (in a recognition worker)
+        encoded = recognition_executor.run(face_service.encode_image_data, image_data)
         
-        if face_encoding is None:
+        if encoded is None:
             raise BadRequestException("No face detected in image. Please try again.")
         
+        face_encoding = encoded[0]
+        
         # Verify face matches user's registered face
         is_match, confidence = face_service.compare_faces(known_encodings, face_encoding)
         
@@ -79,7 +107,7 @@ async def submit_attendance(
         
         # Save attendance image
         image_path = face_service.save_face_image(
-            image,
+            load_image(image_data),
             current_user.nim,
             index=int(datetime.now().timestamp())
         )
@@ -137,7 +165,7 @@ async def submit_attendance(
 
 
 @router.get("/history", response_model=PaginatedResponse[AbsensiResponse])
-async def get_attendance_history(
+def get_attendance_history(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=1000),
     start_date: Optional[date] = None,
@@ -195,7 +223,7 @@ async def get_attendance_history(
 
 
 @router.get("/today", response_model=TodayAttendanceResponse)
-async def get_today_attendance(
+def get_today_attendance(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -225,7 +253,7 @@ async def get_today_attendance(
 
 
 @router.get("/statistics", response_model=AbsensiStatsResponse)
-async def get_attendance_statistics(
+def get_attendance_statistics(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     current_user: User = Depends(get_current_user),
@@ -17,18 +17,27 @@ from app.models.user import User
 from app.models.absensi import Absensi
 from app.models.face_encoding import FaceEncoding
 from app.schemas.user import UserResponse, UserCreate, UserUpdate, UserWithStats
-from app.schemas.absensi import AbsensiResponse, AbsensiSubmitRequest
+from app.schemas.absensi import (
+    AbsensiResponse,
+    AbsensiSubmitRequest,
+    ClassroomFaceResult,
+    ClassroomSnapshotRequest,
+    ClassroomSnapshotResponse
+)
 from app.schemas.common import ResponseBase, PaginatedResponse
 from app.services.attendance_service import attendance_service
 from app.services.face_recognition_service import face_service
-from app.utils.image_processing import decode_base64_image
+from app.services.face_gallery_cache import face_gallery_cache
+from app.services.public_cache import public_cache
+from app.services.recognition_executor import recognition_executor
+from app.utils.image_processing import decode_base64_data, load_image
 from app.core.security import get_password_hash
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 
 @router.get("/dashboard")
-async def get_dashboard(
+def get_dashboard(
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
@@ -45,20 +54,14 @@ async def get_dashboard(
         User.has_face == True
     ).count()
     
-    # Today's attendance
+    # Today's statistics (from the daily attendance summary)
     today = date.today()
-    today_attendance = attendance_service.get_all_today_attendance(db)
-    total_present_today = len(today_attendance)
-    
-    # Today's statistics
     today_stats = attendance_service.get_date_statistics(db, today)
+    total_present_today = today_stats["total_present"]
     
     # This month's statistics
-    from datetime import datetime
     first_day = date.today().replace(day=1)
-    month_stats = db.query(Absensi).filter(
-        Absensi.date >= first_day
-    ).count()
+    month_stats = attendance_service.count_attendance(db, first_day)
     
     return {
         "total_students": total_students,
@@ -74,7 +77,7 @@ async def get_dashboard(
 
 
 @router.get("/students", response_model=PaginatedResponse[UserWithStats])
-async def get_all_students(
+def get_all_students(
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=1000),
     kelas: Optional[str] = None,
@@ -100,17 +103,22 @@ async def get_all_students(
     
     # Get paginated results
     users = query.offset(skip).limit(limit).all()
+    user_ids = [user.id for user in users]
+    
+    # Statistics and encoding counts for the whole page with grouped queries
+    statistics = attendance_service.get_users_statistics(db, user_ids)
+    encodings_counts = dict(
+        db.query(FaceEncoding.user_id, func.count(FaceEncoding.id)).filter(
+            FaceEncoding.user_id.in_(user_ids),
+            FaceEncoding.model == face_service.engine.name
+        ).group_by(FaceEncoding.user_id).all()
+    ) if user_ids else {}
     
     # Build response with statistics
     items = []
     for user in users:
-        # Get user statistics
-        stats = attendance_service.get_user_statistics(db, user.id)
-        
-        # Get face encodings count
-        encodings_count = db.query(FaceEncoding).filter(
-            FaceEncoding.user_id == user.id
-        ).count()
+        stats = statistics[user.id]
+        encodings_count = encodings_counts.get(user.id, 0)
         
         items.append(UserWithStats(
             id=user.id,
@@ -138,7 +146,7 @@ async def get_all_students(
 
 
 @router.post("/students", response_model=UserResponse)
-async def create_student(
+def create_student(
     user_data: UserCreate,
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -184,7 +192,7 @@ async def create_student(
 
 
 @router.put("/students/{user_id}", response_model=UserResponse)
-async def update_student(
+def update_student(
     user_id: int,
     user_data: UserUpdate,
     current_admin: User = Depends(get_current_admin),
@@ -213,6 +221,7 @@ async def update_student(
                 detail="Email already used by another user"
             )
         user.email = user_data.email
+    kelas_changed = bool(user_data.kelas) and user_data.kelas != user.kelas
     if user_data.kelas:
         user.kelas = user_data.kelas
     if user_data.is_active is not None:
@@ -220,14 +229,32 @@ async def update_student(
     if user_data.password:
         user.password_hash = get_password_hash(user_data.password)
     
+    # Class shards of the face gallery follow the student's class
+    gallery_version = face_gallery_cache.bump_version(db) if kelas_changed and user.has_face else None
+    
+    # Move the student's attendance to the new class in the daily summary
+    attendance_dates = []
+    if kelas_changed:
+        attendance_dates = [
+            row.date for row in db.query(Absensi.date).filter(Absensi.user_id == user_id).distinct().all()
+        ]
+        if attendance_dates:
+            db.flush()
+            attendance_service.rebuild_daily_summary(db, dates=attendance_dates)
+    
     db.commit()
     db.refresh(user)
     
+    if gallery_version is not None:
+        face_gallery_cache.move_user(user.id, user.kelas, gallery_version)
+    if kelas_changed:
+        public_cache.invalidate()
+    
     return UserResponse.model_validate(user)
 
 
 @router.delete("/students/{user_id}", response_model=ResponseBase)
-async def delete_student(
+def delete_student(
     user_id: int,
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -250,11 +277,22 @@ async def delete_student(
     db.query(FaceEncoding).filter(FaceEncoding.user_id == user_id).delete()
     
     # Delete attendance records
+    attendance_dates = [row.date for row in db.query(Absensi.date).filter(Absensi.user_id == user_id).all()]
     db.query(Absensi).filter(Absensi.user_id == user_id).delete()
     
     # Delete user
     db.delete(user)
+    db.flush()
+    
+    # Recount the summary of the days the student attended
+    if attendance_dates:
+        attendance_service.rebuild_daily_summary(db, dates=attendance_dates)
+    
+    gallery_version = face_gallery_cache.bump_version(db)
     db.commit()
+    face_gallery_cache.remove_user(user_id, gallery_version)
+    if attendance_dates:
+        public_cache.invalidate()
     
     # Delete face images
     from app.services.face_recognition_service import face_service
@@ -267,7 +305,7 @@ async def delete_student(
 
 
 @router.get("/report")
-async def get_attendance_report(
+def get_attendance_report(
     start_date: date = Query(..., description="Start date for report"),
     end_date: date = Query(..., description="End date for report"),
     kelas: Optional[str] = None,
@@ -394,8 +432,24 @@ async def get_attendance_report(
         )
 
 
+@router.get("/face-gallery")
+def get_face_gallery_stats(
+    recall_samples: int = Query(0, ge=0, le=5000, description="Queries used to estimate ANN recall"),
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Get face gallery size and search mode.
+    With recall_samples > 0, also reports recall of approximate (IVF)
+    search against exact search.
+    """
+    face_gallery_cache.get(db)
+    
+    return face_gallery_cache.stats(recall_samples)
+
+
 @router.get("/statistics/date")
-async def get_date_statistics(
+def get_date_statistics(
     target_date: date = Query(..., description="Target date for statistics"),
     kelas: Optional[str] = None,
     current_admin: User = Depends(get_current_admin),
@@ -414,7 +468,7 @@ async def get_date_statistics(
 
 
 @router.post("/students/bulk", response_model=ResponseBase)
-async def bulk_create_students(
+def bulk_create_students(
     students: List[UserCreate],
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -463,7 +517,7 @@ async def bulk_create_students(
 
 
 @router.post("/students/import-csv", response_model=ResponseBase)
-async def import_students_from_csv(
+def import_students_from_csv(
     file: UploadFile = File(...),
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -483,7 +537,7 @@ async def import_students_from_csv(
     
     try:
         # Read CSV content
-        content = await file.read()
+        content = file.file.read()
         decoded = content.decode('utf-8')
         
         # Parse CSV
@@ -557,7 +611,7 @@ async def import_students_from_csv(
         )
 
 @router.post("/submit-attendance", response_model=AbsensiResponse)
-async def admin_submit_attendance(
+def admin_submit_attendance(
     request: AbsensiSubmitRequest,
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -567,50 +621,31 @@ async def admin_submit_attendance(
     Admin scans student face and submits attendance on their behalf.
     """
     try:
-        # Decode image
-        image = decode_base64_image(request.image_base64)
+        # Decode base64 to raw image bytes
+        image_data = decode_base64_data(request.image_base64)
         
-        # Get face encoding from submitted image
-        face_encoding = face_service.encode_face(image)
+        # Get face encoding from submitted image (in a recognition worker)
+        encoded = recognition_executor.run(face_service.encode_image_data, image_data)
         
-        if face_encoding is None:
+        if encoded is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No face detected in image. Please try again."
             )
         
-        # Find matching user by comparing with all registered faces
-        from app.models.face_encoding import FaceEncoding
+        face_encoding = encoded[0]
         
-        face_encodings_db = db.query(FaceEncoding).all()
+        # Find matching user by comparing with all registered faces
+        gallery = face_gallery_cache.get(db)
         
-        if not face_encodings_db:
+        if len(gallery) == 0:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No registered faces in database"
             )
         
-        # Group encodings by user
-        user_encodings = {}
-        for fe in face_encodings_db:
-            if fe.user_id not in user_encodings:
-                user_encodings[fe.user_id] = []
-            try:
-                enc = face_service.deserialize_encoding(fe.encoding_data)
-                user_encodings[fe.user_id].append(enc)
-            except Exception as e:
-                print(f"Failed to deserialize encoding for user {fe.user_id}: {e}")
-                continue
-        
-        # Find best match
-        best_match_id = None
-        best_confidence = 0.0
-        
-        for user_id, encodings in user_encodings.items():
-            is_match, confidence = face_service.compare_faces(encodings, face_encoding)
-            if is_match and confidence > best_confidence:
-                best_confidence = confidence
-                best_match_id = user_id
+        # Find best match against all registered faces at once
+        best_match_id, best_confidence = face_service.match_gallery(gallery, face_encoding)
         
         if best_match_id is None:
             raise HTTPException(
@@ -630,7 +665,7 @@ async def admin_submit_attendance(
         # Save attendance image
         from datetime import datetime
         image_path = face_service.save_face_image(
-            image,
+            load_image(image_data),
             user.nim,
             index=int(datetime.now().timestamp())
         )
@@ -681,4 +716,102 @@ async def admin_submit_attendance(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error submitting attendance: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/submit-attendance/classroom", response_model=ClassroomSnapshotResponse)
+def admin_submit_classroom_attendance(
+    request: ClassroomSnapshotRequest,
+    current_admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Submit attendance for every student recognized in one classroom photo.
+    Requires admin role.
+    
+    All faces are detected and encoded in a single pass, matched against
+    the gallery in one batched lookup (class shard first, if `kelas` is
+    given) and recorded in one transaction.
+    """
+    try:
+        image_data = decode_base64_data(request.image_base64)
+        
+        # Detect and encode all faces (in a recognition worker)
+        faces = recognition_executor.run(face_service.encode_all_image_data, image_data)
+        
+        if not faces:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No face detected in image. Please try again."
+            )
+        
+        gallery = face_gallery_cache.get(db)
+        
+        if len(gallery) == 0:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="No registered faces in database"
+            )
+        
+        matches = face_gallery_cache.match_batch(db, [encoding for encoding, _ in faces], request.kelas)
+        
+        matched_ids = {user_id for user_id, _ in matches if user_id is not None}
+        users = {
+            user.id: user
+            for user in db.query(User).filter(User.id.in_(matched_ids)).all()
+        } if matched_ids else {}
+        
+        submitted = {}
+        if users:
+            image_path = face_service.save_snapshot_image(load_image(image_data))
+            submitted = attendance_service.submit_attendance_bulk(
+                db=db,
+                entries=[(user_id, confidence) for user_id, confidence in matches if user_id in users],
+                image_path=image_path
+            )
+        
+        results = []
+        for (_, face_location), (user_id, confidence) in zip(faces, matches):
+            user = users.get(user_id)
+            
+            if user is None:
+                results.append(ClassroomFaceResult(
+                    face_location=list(face_location),
+                    recognized=False,
+                    confidence=confidence
+                ))
+                continue
+            
+            attendance, is_duplicate = submitted[user.id]
+            results.append(ClassroomFaceResult(
+                face_location=list(face_location),
+                recognized=True,
+                confidence=confidence,
+                user_id=user.id,
+                nim=user.nim,
+                name=user.name,
+                kelas=user.kelas,
+                attendance_id=attendance.id,
+                status=attendance.status,
+                already_submitted=is_duplicate
+            ))
+        
+        submitted_count = sum(1 for _, is_duplicate in submitted.values() if not is_duplicate)
+        
+        return ClassroomSnapshotResponse(
+            faces_detected=len(faces),
+            recognized_count=len(users),
+            submitted_count=submitted_count,
+            faces=results,
+            message=f"{len(faces)} wajah terdeteksi, {len(users)} dikenali, {submitted_count} absensi baru dicatat"
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Admin classroom attendance error: {e}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error submitting attendance: {str(e)}"
+        )
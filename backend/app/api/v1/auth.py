@@ -32,7 +32,7 @@ router = APIRouter()
 
 
 @router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-async def register(
+def register(
     request: RegisterRequest,
     db: Session = Depends(get_db)
 ):
@@ -90,7 +90,7 @@ async def register(
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(
+def login(
     request: LoginRequest,
     db: Session = Depends(get_db)
 ):
@@ -133,7 +133,7 @@ async def login(
 
 
 @router.post("/refresh", response_model=TokenResponse)
-async def refresh_token(
+def refresh_token(
     request: RefreshTokenRequest,
     db: Session = Depends(get_db)
 ):
@@ -192,7 +192,7 @@ async def refresh_token(
 
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
-async def logout(
+def logout(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -211,7 +211,7 @@ async def logout(
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(
+def get_current_user_info(
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -221,7 +221,7 @@ async def get_current_user_info(
 
 
 @router.put("/change-password", status_code=status.HTTP_200_OK)
-async def change_password(
+def change_password(
     request: ChangePasswordRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -8,32 +8,43 @@ Updated: 30 Dec 2025
 - Liveness detection handled by frontend (MediaPipe)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from typing import List
-from PIL import Image
+from typing import List, Optional, Tuple
+import asyncio
 import numpy as np
 
-from app.api.deps import get_current_user, get_current_admin, get_db
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.api.deps import IMAGE_UPLOAD_OPENAPI, get_current_user, get_current_admin, get_db, get_image_uploads
 from app.models.user import User
 from app.models.face_encoding import FaceEncoding
 from app.schemas.face import (
     FaceScanRequest,
+    FaceScanBatchRequest,
     FaceRegisterRequest,
     FaceScanResponse,
+    FaceScanBatchResponse,
     FaceRegisterResponse,
     FaceStatusResponse
 )
 from app.schemas.common import ResponseBase
 from app.services.face_recognition_service import face_service
-from app.utils.image_processing import decode_base64_image
-from app.core.exceptions import BadRequestException, NotFoundException
+from app.services.face_gallery import FaceGallery
+from app.services.face_gallery_cache import face_gallery_cache
+from app.services.recognition_cache import recognition_cache
+from app.services.recognition_executor import recognition_executor
+from app.services.scan_stream import ScanStreamSession
+from app.utils.image_processing import decode_base64_data, dhash
+from app.core.exceptions import BadRequestException, NotFoundException, ServiceBusyException
 
 router = APIRouter(prefix="/face", tags=["Face Recognition"])
 
 
 @router.post("/scan", response_model=FaceScanResponse)
-async def scan_face(
+def scan_face(
     request: FaceScanRequest,
     db: Session = Depends(get_db)
 ):
@@ -42,25 +53,91 @@ async def scan_face(
     Public endpoint (no authentication required).
     
     Algorithm:
-    1. Decode base64 image to PIL Image
-    2. Extract 128D face encoding using face_recognition
-    3. Load all registered face encodings from database
-    4. Compare with known faces using Euclidean distance
+    1. Decode base64 image to raw bytes
+    2. In a recognition worker: detect face once (downscaled) and extract its 128D encoding
+    3. Get cached gallery matrix of all registered face encodings
+    4. Compare with all known faces at once using Euclidean distance
+       (only the requested classes first, if `kelas` is given)
     5. Return best match if distance < tolerance (0.6)
     """
+    print("🔍 [face/scan] Starting face scan...")
+    
+    # Decode base64 to raw image bytes
+    print("📸 [face/scan] Decoding base64 image...")
     try:
-        print("🔍 [face/scan] Starting face scan...")
-        
-        # Decode base64 image to PIL Image
-        print("📸 [face/scan] Decoding base64 image...")
-        pil_image = decode_base64_image(request.image_base64)
-        print(f"✓ [face/scan] PIL Image decoded: {pil_image.size}")
-        
-        # Extract face encoding from query image
+        image_data = decode_base64_data(request.image_base64)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid base64 image")
+    print(f"✓ [face/scan] Image data decoded: {len(image_data)} bytes")
+    
+    return _scan_image_data(image_data, request.kelas, db)
+
+
+@router.post("/scan/upload", response_model=FaceScanResponse, openapi_extra=IMAGE_UPLOAD_OPENAPI)
+def scan_face_upload(
+    kelas: Optional[List[str]] = Query(None, description="Restrict matching to these classes first"),
+    images: List[bytes] = Depends(get_image_uploads),
+    db: Session = Depends(get_db)
+):
+    """
+    Same as /face/scan, but the image is sent as raw bytes
+    (multipart/form-data or application/octet-stream) instead of base64 JSON.
+    Public endpoint (no authentication required).
+    """
+    print(f"🔍 [face/scan/upload] Starting face scan ({len(images[0])} bytes)...")
+    
+    return _scan_image_data(images[0], kelas, db)
+
+
+def _scan_image_data(
+    image_data: bytes,
+    kelas: Optional[List[str]],
+    db: Session
+) -> FaceScanResponse:
+    """Recognize the largest face in raw image bytes (shared by /scan endpoints)."""
+    # Get cached face gallery (reloaded only when encodings changed)
+    gallery = face_gallery_cache.get(db)
+    
+    if not recognition_cache.enabled:
+        return _recognize_image_data(image_data, kelas, gallery, db)
+    
+    # Near-duplicate of a recent frame: reuse its result
+    try:
+        frame_hash = dhash(image_data)
+    except Exception:
+        return _recognize_image_data(image_data, kelas, gallery, db)
+    
+    scope = tuple(sorted(set(kelas or [])))
+    gallery_version = face_gallery_cache.version
+    
+    cached = recognition_cache.get(frame_hash, scope, gallery_version)
+    if cached is not None:
+        print("⚡ [face/scan] Near-duplicate frame, reusing cached result")
+        return FaceScanResponse(**cached)
+    
+    response = _recognize_image_data(image_data, kelas, gallery, db)
+    
+    # Only frames without a face are reused: a frame hash cannot tell two
+    # students in the same uniform in front of the same background apart
+    if response.face_location is None:
+        recognition_cache.put(frame_hash, scope, gallery_version, response.model_dump())
+    
+    return response
+
+
+def _recognize_image_data(
+    image_data: bytes,
+    kelas: Optional[List[str]],
+    gallery: FaceGallery,
+    db: Session
+) -> FaceScanResponse:
+    """Encode the largest face and match it against the gallery."""
+    try:
+        # Extract face encoding from query image (in a recognition worker)
         print("🧠 [face/scan] Extracting face encoding...")
-        query_encoding = face_service.encode_face(pil_image)
+        encoded = recognition_executor.run(face_service.encode_image_data, image_data)
         
-        if query_encoding is None:
+        if encoded is None:
             print("❌ [face/scan] No face detected in image")
             return FaceScanResponse(
                 recognized=False,
@@ -68,92 +145,301 @@ async def scan_face(
                 message="Tidak ada wajah terdeteksi dalam gambar"
             )
         
+        query_encoding, face_location = encoded
         print(f"✓ [face/scan] Encoding extracted: shape={query_encoding.shape}")
         
-        # Get all face encodings from database
-        print("📊 [face/scan] Fetching face encodings from database...")
-        face_encodings_db = db.query(FaceEncoding).all()
-        print(f"✓ [face/scan] Found {len(face_encodings_db)} face encodings")
-        
-        if not face_encodings_db:
-            print("⚠️ [face/scan] No registered faces in database")
-            return FaceScanResponse(
-                recognized=False,
-                confidence=0.0,
-                message="Belum ada wajah terdaftar dalam sistem"
-            )
+        return _match_encoding(db, gallery, query_encoding, face_location, kelas)
         
-        # Deserialize encodings and group by user_id
-        print("🔓 [face/scan] Deserializing encodings...")
-        user_encodings = {}  # {user_id: [encodings]}
+    except BadRequestException as e:
+        print(f"❌ [face/scan] Bad request: {str(e)}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ServiceBusyException:
+        raise
+    except Exception as e:
+        print(f"❌ [face/scan] Unexpected error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Face recognition error: {str(e)}"
+        )
+
+
+def _match_encoding(
+    db: Session,
+    gallery: FaceGallery,
+    query_encoding: np.ndarray,
+    face_location: Tuple[int, int, int, int],
+    kelas: Optional[List[str]]
+) -> FaceScanResponse:
+    """Match one face encoding (class shard first, if given) and build the scan response."""
+    print(f"✓ [face/scan] Gallery has {len(gallery)} encodings for {gallery.user_count} users")
+    
+    if len(gallery) == 0:
+        print("⚠️ [face/scan] No registered faces in database")
+        return FaceScanResponse(
+            recognized=False,
+            confidence=0.0,
+            face_location=list(face_location),
+            message="Belum ada wajah terdaftar dalam sistem"
+        )
+    
+    best_match_id = None
+    best_confidence = 0.0
+    
+    # Class-scoped kiosk: match against the class shard first
+    if kelas:
+        print(f"🏫 [face/scan] Matching within class(es): {', '.join(kelas)}")
+        scoped_gallery = face_gallery_cache.get_scoped(db, kelas)
+        best_match_id, best_confidence = face_service.match_gallery(scoped_gallery, query_encoding)
         
-        for fe in face_encodings_db:
+        if best_match_id is None:
+            print("↩️ [face/scan] No match in class shard, falling back to all registered faces")
+    
+    # Find best match (one matrix-vector distance + per-user min)
+    if best_match_id is None:
+        print("🔍 [face/scan] Comparing with registered faces...")
+        best_match_id, best_confidence = face_service.match_gallery(gallery, query_encoding)
+    
+    if best_match_id is None:
+        print("❌ [face/scan] Face not recognized")
+        return FaceScanResponse(
+            recognized=False,
+            confidence=0.0,
+            face_location=list(face_location),
+            message="Wajah tidak dikenali. Pastikan wajah Anda sudah terdaftar."
+        )
+    
+    # Get user info
+    print(f"👤 [face/scan] Fetching user info for ID: {best_match_id}")
+    user = db.query(User).filter(User.id == best_match_id).first()
+    
+    if not user:
+        print(f"❌ [face/scan] User {best_match_id} not found in database")
+        return FaceScanResponse(
+            recognized=False,
+            confidence=0.0
+        )
+    
+    print(f"✅ [face/scan] Face recognized: {user.name} ({user.nim}) - confidence: {best_confidence:.2%}")
+    return FaceScanResponse(
+        recognized=True,
+        user_id=user.id,
+        nim=user.nim,
+        name=user.name,
+        kelas=user.kelas,
+        confidence=best_confidence,
+        face_location=list(face_location)
+    )
+
+
+@router.websocket("/scan/stream")
+async def scan_face_stream(
+    websocket: WebSocket,
+    kelas: Optional[List[str]] = Query(None),
+    stable_frames: int = Query(settings.STREAM_STABLE_FRAMES, ge=1, le=30)
+):
+    """
+    Streaming face scan for kiosks over one WebSocket connection.
+    Public endpoint (no authentication required).
+    
+    Protocol:
+    - Client sends frames as binary messages (JPEG/PNG bytes)
+    - Server replies with a {"type": "frame"} message per recognized frame
+      and a {"type": "result", ...FaceScanResponse} message once the same
+      person was matched in `stable_frames` consecutive frames
+    - Frames arriving while one is being recognized replace each other,
+      only the latest one is processed (latest-frame-wins)
+    - Once a person is stable, following frames only run face detection;
+      the face is re-encoded when it no longer overlaps the tracked box
+      or every FACE_TRACK_REFRESH_FRAMES frames
+    - Text message "stats" returns frame and encoding counters
+    """
+    await websocket.accept()
+    
+    session = ScanStreamSession(stable_frames)
+    max_bytes = settings.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+    
+    async def receive_frames() -> None:
+        while True:
+            message = await websocket.receive()
+            
+            if message["type"] == "websocket.disconnect":
+                return
+            
+            if message.get("bytes") is not None:
+                if len(message["bytes"]) > max_bytes:
+                    await websocket.send_json({"type": "error", "message": "Frame too large"})
+                    continue
+                session.push_frame(message["bytes"])
+            elif message.get("text") == "stats":
+                await websocket.send_json(session.stats())
+    
+    async def process_frames() -> None:
+        while True:
+            frame = await session.next_frame()
+            
             try:
-                encoding = face_service.deserialize_encoding(fe.encoding_data)
-                if fe.user_id not in user_encodings:
-                    user_encodings[fe.user_id] = []
-                user_encodings[fe.user_id].append(encoding)
+                track_box, refresh = session.tracker.plan()
+                tracked = await recognition_executor.run_async(
+                    face_service.track_image_data, frame, track_box, refresh
+                )
+                
+                if tracked is None:
+                    session.tracker.reset()
+                    response = await run_in_threadpool(_match_stream_frame, None, kelas)
+                elif tracked[1] is None:
+                    # Same face as the tracked one: reuse its match
+                    response = session.tracker.continue_track(tracked[0])
+                else:
+                    box, encoding = tracked
+                    response = await run_in_threadpool(_match_stream_frame, (encoding, box), kelas)
+                    session.tracker.observe(box, response)
+            except ServiceBusyException:
+                await websocket.send_json({"type": "busy", "message": "Server sibuk, frame dilewati"})
+                continue
+            except BadRequestException as e:
+                await websocket.send_json({"type": "error", "message": e.detail})
+                continue
             except Exception as e:
-                print(f"⚠️ [face/scan] Failed to deserialize encoding for user {fe.user_id}: {e}")
+                print(f"❌ [face/scan/stream] Frame error: {e}")
+                await websocket.send_json({"type": "error", "message": "Gambar tidak valid"})
                 continue
+            
+            for message in session.update(response):
+                await websocket.send_json(message)
+    
+    receiver = asyncio.create_task(receive_frames())
+    processor = asyncio.create_task(process_frames())
+    
+    try:
+        done, _ = await asyncio.wait({receiver, processor}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error is not None and not isinstance(error, WebSocketDisconnect):
+                print(f"❌ [face/scan/stream] Session error: {error}")
+    finally:
+        receiver.cancel()
+        processor.cancel()
+        print(f"👋 [face/scan/stream] Session closed: {session.received} frames received, "
+              f"{session.processed} processed, {session.dropped} dropped, "
+              f"{session.tracker.skipped} encodings skipped")
+
+
+def _match_stream_frame(encoded, kelas: Optional[List[str]]) -> FaceScanResponse:
+    """Match one streamed frame's encoding (runs in the thread pool, own DB session)."""
+    if encoded is None:
+        return FaceScanResponse(
+            recognized=False,
+            confidence=0.0,
+            message="Tidak ada wajah terdeteksi dalam gambar"
+        )
+    
+    db = SessionLocal()
+    try:
+        gallery = face_gallery_cache.get(db)
+        return _match_encoding(db, gallery, encoded[0], encoded[1], kelas)
+    finally:
+        db.close()
+
+
+@router.post("/scan/batch", response_model=FaceScanBatchResponse)
+def scan_face_batch(
+    request: FaceScanBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Scan and recognize faces in several frames at once.
+    Public endpoint (no authentication required).
+    
+    Algorithm:
+    1. Decode all base64 images to raw bytes
+    2. Encode the frames in parallel, one chunk per recognition worker
+    3. Match all encodings against the cached gallery in one
+       matrix-matrix distance computation (class shard first, if `kelas` is given)
+    4. Fetch matched users with a single query
+    5. Return one result per frame, in request order
+    """
+    try:
+        print(f"🔍 [face/scan/batch] Scanning {len(request.images_base64)} frames...")
         
-        print(f"✓ [face/scan] Loaded encodings for {len(user_encodings)} users")
+        results: List[FaceScanResponse] = [None] * len(request.images_base64)
+        frames = []
         
-        if not user_encodings:
-            return FaceScanResponse(
-                recognized=False,
-                confidence=0.0,
-                message="Tidak ada encoding valid dalam database"
-            )
+        for idx, image_base64 in enumerate(request.images_base64):
+            try:
+                frames.append((idx, decode_base64_data(image_base64)))
+            except ValueError:
+                results[idx] = FaceScanResponse(recognized=False, message="Gambar tidak valid")
+        
+        # Encode frames in parallel (each worker gets a contiguous chunk)
+        encoded = recognition_executor.run_chunked(
+            face_service.encode_images_data,
+            [image_data for _, image_data in frames]
+        )
         
-        # Find best match
-        print("🔍 [face/scan] Comparing with registered faces...")
-        best_match_id = None
-        best_confidence = 0.0
+        faces = []
+        for (idx, _), result in zip(frames, encoded):
+            if isinstance(result, Exception):
+                # A bad frame (unreadable, too dark, ...) must not fail the whole batch
+                message = result.detail if isinstance(result, BadRequestException) else "Gambar tidak valid"
+                results[idx] = FaceScanResponse(recognized=False, message=message)
+            elif result is None:
+                results[idx] = FaceScanResponse(
+                    recognized=False,
+                    message="Tidak ada wajah terdeteksi dalam gambar"
+                )
+            else:
+                faces.append((idx, result[0], result[1]))
         
-        for user_id, encodings in user_encodings.items():
-            # Compare with all encodings for this user
-            is_match, confidence = face_service.compare_faces(encodings, query_encoding)
-            print(f"   • User {user_id}: confidence={confidence:.2%}, match={is_match}")
-            
-            if is_match and confidence > best_confidence:
-                best_confidence = confidence
-                best_match_id = user_id
+        print(f"✓ [face/scan/batch] {len(faces)} of {len(frames)} frames have a face")
         
-        if best_match_id is None:
-            print("❌ [face/scan] Face not recognized")
-            return FaceScanResponse(
-                recognized=False,
-                confidence=best_confidence,
-                message="Wajah tidak dikenali. Pastikan wajah Anda sudah terdaftar."
-            )
+        gallery = face_gallery_cache.get(db)
         
-        # Get user info
-        print(f"👤 [face/scan] Fetching user info for ID: {best_match_id}")
-        user = db.query(User).filter(User.id == best_match_id).first()
+        # Class-scoped kiosk: class shard first, then all registered faces
+        matches = face_gallery_cache.match_batch(
+            db,
+            [encoding for _, encoding, _ in faces],
+            request.kelas
+        )
         
-        if not user:
-            print(f"❌ [face/scan] User {best_match_id} not found in database")
-            return FaceScanResponse(
-                recognized=False,
-                confidence=0.0
+        matched_ids = {user_id for user_id, _ in matches if user_id is not None}
+        users = {
+            user.id: user
+            for user in db.query(User).filter(User.id.in_(matched_ids)).all()
+        } if matched_ids else {}
+        
+        for (idx, _, face_location), (user_id, confidence) in zip(faces, matches):
+            user = users.get(user_id)
+            
+            if user is None:
+                results[idx] = FaceScanResponse(
+                    recognized=False,
+                    face_location=list(face_location),
+                    message="Wajah tidak dikenali. Pastikan wajah Anda sudah terdaftar."
+                    if len(gallery) > 0 else "Belum ada wajah terdaftar dalam sistem"
+                )
+                continue
+            
+            results[idx] = FaceScanResponse(
+                recognized=True,
+                user_id=user.id,
+                nim=user.nim,
+                name=user.name,
+                kelas=user.kelas,
+                confidence=confidence,
+                face_location=list(face_location)
             )
         
-        print(f"✅ [face/scan] Face recognized: {user.name} ({user.nim}) - confidence: {best_confidence:.2%}")
-        return FaceScanResponse(
-            recognized=True,
-            user_id=user.id,
-            nim=user.nim,
-            name=user.name,
-            kelas=user.kelas,
-            confidence=best_confidence
-        )
+        recognized_count = sum(1 for result in results if result.recognized)
+        print(f"✅ [face/scan/batch] Recognized {recognized_count} of {len(results)} frames")
         
-    except BadRequestException as e:
-        print(f"❌ [face/scan] Bad request: {str(e)}")
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return FaceScanBatchResponse(results=results, recognized_count=recognized_count)
+        
+    except ServiceBusyException:
+        raise
     except Exception as e:
-        print(f"❌ [face/scan] Unexpected error: {str(e)}")
+        print(f"❌ [face/scan/batch] Unexpected error: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(
@@ -163,8 +449,9 @@ async def scan_face(
 
 
 @router.post("/register", response_model=FaceRegisterResponse)
-async def register_face(
+def register_face(
     request: FaceRegisterRequest,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -174,102 +461,143 @@ async def register_face(
     
     Process:
     1. Validate image count (3-5 images)
-    2. Delete existing encodings for this user
-    3. For each image:
-       - Decode base64 to PIL Image
-       - Extract 128D face encoding using face_recognition library
-       - Save encoding to database
-       - Save image to filesystem
+    2. Extract 128D face encodings of all images in parallel (one recognition job per image)
+    3. Replace existing encodings for this user with one bulk insert
     4. Update user's has_face status
+    5. Save images to filesystem in the background, after the response
+    """
+    try:
+        images_data = [decode_base64_data(image_base64) for image_base64 in request.images_base64]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid base64 image")
+    
+    encodings_created = _register_face_images(current_user, images_data, db, background_tasks, "face/register")
+    
+    return FaceRegisterResponse(
+        success=True,
+        message=f"Wajah berhasil didaftarkan dengan {encodings_created} encoding",
+        encodings_count=encodings_created
+    )
+
+
+@router.post("/register/upload", response_model=FaceRegisterResponse, openapi_extra=IMAGE_UPLOAD_OPENAPI)
+def register_face_upload(
+    background_tasks: BackgroundTasks,
+    images: List[bytes] = Depends(get_image_uploads),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Same as /face/register, but the 3-5 images are sent as multipart/form-data
+    files instead of base64 JSON.
+    """
+    encodings_created = _register_face_images(current_user, images, db, background_tasks, "face/register")
+    
+    return FaceRegisterResponse(
+        success=True,
+        message=f"Wajah berhasil didaftarkan dengan {encodings_created} encoding",
+        encodings_count=encodings_created
+    )
+
+
+def _register_face_images(
+    user: User,
+    images_data: List[bytes],
+    db: Session,
+    background_tasks: BackgroundTasks,
+    log_tag: str
+) -> int:
+    """
+    Replace a user's face encodings (shared by all registration endpoints).
+    
+    Encoding fans out over the recognition workers, the database is written
+    with one bulk insert and the images are saved after the response.
+    
+    Args:
+        user: User to register
+        images_data: Raw image bytes (3-5 images)
+        db: Database session
+        background_tasks: Response background tasks (for the disk writes)
+        log_tag: Prefix for log lines
+        
+    Returns:
+        Number of encodings stored
     """
-    print(f"🔐 [face/register] Registering faces for user: {current_user.name} ({current_user.nim})")
+    print(f"🔐 [{log_tag}] Registering faces for user: {user.name} ({user.nim})")
     
-    if len(request.images_base64) < 3:
+    if len(images_data) < 3:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="At least 3 images required for face registration"
         )
     
-    if len(request.images_base64) > 5:
+    if len(images_data) > 5:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Maximum 5 images allowed"
         )
     
     try:
-        # Delete existing face encodings
-        deleted_count = db.query(FaceEncoding).filter(FaceEncoding.user_id == current_user.id).delete()
-        print(f"🗑️ [face/register] Deleted {deleted_count} existing encodings")
+        # Encode all images in parallel, one recognition job per image
+        print(f"📸 [{log_tag}] Encoding {len(images_data)} images...")
+        results = recognition_executor.run_chunked(face_service.encode_images_data, images_data, chunk_size=1)
         
-        # Delete existing face images
-        face_service.delete_user_images(current_user.nim)
-        
-        # Process each image
-        encodings_created = 0
+        rows = []
+        new_encodings = []
+        saved_images = []
         
-        for idx, image_base64 in enumerate(request.images_base64):
-            try:
-                print(f"📸 [face/register] Processing image {idx + 1}/{len(request.images_base64)}...")
-                
-                # Decode base64 to PIL Image
-                pil_image = decode_base64_image(image_base64)
-                print(f"✓ [face/register] Image decoded: {pil_image.size}")
-                
-                # Extract face encoding using face_recognition library (fast!)
-                encoding = face_service.encode_face(pil_image)
-                
-                if encoding is None:
-                    print(f"⚠️ [face/register] No face detected in image {idx + 1}")
-                    continue
-                
-                print(f"✓ [face/register] Encoding extracted: shape={encoding.shape}")
-                
-                # Save image to filesystem
-                image_path = face_service.save_face_image(pil_image, current_user.nim, idx)
-                print(f"✓ [face/register] Image saved: {image_path}")
-                
-                # Serialize encoding (convert to bytes)
-                encoding_data = face_service.serialize_encoding(encoding)
-                
-                # Save to database
-                face_encoding = FaceEncoding(
-                    user_id=current_user.id,
-                    encoding_data=encoding_data,
-                    image_path=image_path,
-                    confidence=1.0  # Self-registration
-                )
-                
-                db.add(face_encoding)
-                encodings_created += 1
-                print(f"✓ [face/register] Encoding {idx + 1} saved to database")
-                
-            except Exception as e:
-                print(f"⚠️ [face/register] Failed to process image {idx + 1}: {e}")
+        for idx, (image_data, result) in enumerate(zip(images_data, results)):
+            if isinstance(result, Exception):
+                print(f"⚠️ [{log_tag}] Failed to process image {idx + 1}: {result}")
+                continue
+            
+            if result is None:
+                print(f"⚠️ [{log_tag}] No face detected in image {idx + 1}")
                 continue
+            
+            encoding = result[0]
+            image_path = face_service.face_image_path(user.nim, idx)
+            
+            rows.append(face_service.encoding_row(user.id, encoding, image_path))
+            new_encodings.append(encoding)
+            saved_images.append((image_data, image_path))
         
-        if encodings_created == 0:
-            db.rollback()
+        if not rows:
             raise BadRequestException("Tidak ada wajah terdeteksi di foto yang diunggah. Pastikan wajah terlihat jelas.")
         
+        # Replace existing face encodings of the active engine with one bulk insert,
+        # encodings of other engines stay so the engine can be switched back
+        deleted_count = db.query(FaceEncoding).filter(
+            FaceEncoding.user_id == user.id,
+            FaceEncoding.model == face_service.engine.name
+        ).delete()
+        print(f"🗑️ [{log_tag}] Deleted {deleted_count} existing encodings")
+        
+        db.execute(insert(FaceEncoding), rows)
+        
         # Update user's has_face status
-        current_user.has_face = True
+        user.has_face = True
         
+        gallery_version = face_gallery_cache.bump_version(db)
         db.commit()
+        face_gallery_cache.update_user(user.id, new_encodings, gallery_version, user.kelas)
         
-        print(f"✅ [face/register] Successfully registered {encodings_created} face encodings for {current_user.name}")
+        # Replace images on disk after the response has been sent
+        background_tasks.add_task(face_service.replace_user_images, user.nim, saved_images)
         
-        return FaceRegisterResponse(
-            success=True,
-            message=f"Wajah berhasil didaftarkan dengan {encodings_created} encoding",
-            encodings_count=encodings_created
-        )
+        print(f"✅ [{log_tag}] Successfully registered {len(rows)} face encodings for {user.name}")
+        
+        return len(rows)
         
     except BadRequestException as e:
         db.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ServiceBusyException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
-        print(f"💥 [face/register] Error: {str(e)}")
+        print(f"💥 [{log_tag}] Error: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(
@@ -279,23 +607,25 @@ async def register_face(
 
 
 @router.get("/status", response_model=FaceStatusResponse)
-async def get_face_status(
+def get_face_status(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get face registration status for current user."""
+    # Only encodings of the active engine can be recognized
     encodings_count = db.query(FaceEncoding).filter(
-        FaceEncoding.user_id == current_user.id
+        FaceEncoding.user_id == current_user.id,
+        FaceEncoding.model == face_service.engine.name
     ).count()
     
     return FaceStatusResponse(
-        has_face=current_user.has_face,
+        has_face=current_user.has_face and encodings_count > 0,
         encodings_count=encodings_count
     )
 
 
 @router.delete("/unregister", response_model=ResponseBase)
-async def unregister_face(
+def unregister_face(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -315,7 +645,9 @@ async def unregister_face(
         # Delete face images
         face_service.delete_user_images(current_user.nim)
         
+        gallery_version = face_gallery_cache.bump_version(db)
         db.commit()
+        face_gallery_cache.remove_user(current_user.id, gallery_version)
         
         return ResponseBase(
             success=True,
@@ -332,9 +664,10 @@ async def unregister_face(
 
 # Admin endpoints
 @router.post("/admin/register/{user_id}", response_model=FaceRegisterResponse)
-async def admin_register_face(
+def admin_register_face(
     user_id: int,
     request: FaceRegisterRequest,
+    background_tasks: BackgroundTasks,
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
@@ -347,96 +680,22 @@ async def admin_register_face(
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    print(f"🔐 [admin/register] Admin registering faces for: {user.name} ({user.nim})")
-    
-    if len(request.images_base64) < 3:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="At least 3 images required for face registration"
-        )
+    try:
+        images_data = [decode_base64_data(image_base64) for image_base64 in request.images_base64]
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid base64 image")
     
-    if len(request.images_base64) > 5:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Maximum 5 images allowed"
-        )
+    encodings_created = _register_face_images(user, images_data, db, background_tasks, "admin/register")
     
-    try:
-        # Delete existing face encodings
-        deleted_count = db.query(FaceEncoding).filter(FaceEncoding.user_id == user.id).delete()
-        print(f"🗑️ [admin/register] Deleted {deleted_count} existing encodings")
-        
-        # Process each image using fast face_recognition library (dlib-based)
-        encodings_created = 0
-        
-        for idx, image_base64 in enumerate(request.images_base64):
-            try:
-                print(f"📸 [admin/register] Processing image {idx + 1}/{len(request.images_base64)}...")
-                
-                # Decode base64 to PIL Image
-                pil_image = decode_base64_image(image_base64)
-                
-                # Extract face encoding using face_recognition (fast, dlib-based)
-                encoding = face_service.encode_face(pil_image)
-                
-                if encoding is None:
-                    print(f"⚠️ [admin/register] No face detected in image {idx + 1}")
-                    continue
-                    
-                print(f"✓ [admin/register] Face encoding extracted: shape={encoding.shape}")
-                
-                # Save image to filesystem
-                image_path = face_service.save_face_image(pil_image, user.nim, idx)
-                print(f"✓ [admin/register] Image saved: {image_path}")
-                
-                # Serialize encoding
-                encoding_data = face_service.serialize_encoding(encoding)
-                
-                # Save to database
-                face_encoding = FaceEncoding(
-                    user_id=user.id,
-                    encoding_data=encoding_data,
-                    image_path=image_path,
-                    confidence=1.0
-                )
-                
-                db.add(face_encoding)
-                encodings_created += 1
-                
-            except Exception as e:
-                print(f"⚠️ [admin/register] Failed to process image {idx + 1}: {e}")
-                continue
-        
-        if encodings_created == 0:
-            raise BadRequestException("No valid faces detected in any image")
-        
-        user.has_face = True
-        db.commit()
-        
-        print(f"✅ [admin/register] Successfully registered {encodings_created} face encodings for {user.name}")
-        
-        return FaceRegisterResponse(
-            success=True,
-            message=f"Face registered for {user.name} with {encodings_created} encodings",
-            encodings_count=encodings_created
-        )
-        
-    except BadRequestException as e:
-        db.rollback()
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
-    except Exception as e:
-        db.rollback()
-        print(f"💥 [admin/register] Error: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Face registration error: {str(e)}"
-        )
+    return FaceRegisterResponse(
+        success=True,
+        message=f"Face registered for {user.name} with {encodings_created} encodings",
+        encodings_count=encodings_created
+    )
 
 
 @router.delete("/admin/unregister/{user_id}", response_model=ResponseBase)
-async def admin_unregister_face(
+def admin_unregister_face(
     user_id: int,
     current_admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
@@ -458,7 +717,9 @@ async def admin_unregister_face(
         user.has_face = False
         face_service.delete_user_images(user.nim)
         
+        gallery_version = face_gallery_cache.bump_version(db)
         db.commit()
+        face_gallery_cache.remove_user(user.id, gallery_version)
         
         return ResponseBase(
             success=True,
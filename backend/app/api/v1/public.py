@@ -3,48 +3,154 @@ Public API Routes
 Public endpoints that don't require authentication.
 """
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import date
-from typing import Optional
+from typing import Any, Callable, Dict, Hashable, Optional
+import json
 
 from app.api.deps import get_db
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.attendance_events import attendance_broadcaster
 from app.services.attendance_service import attendance_service
+from app.services.public_cache import public_cache
 
 router = APIRouter(prefix="/public", tags=["Public"])
 
 
+def _cached_response(request: Request, key: Hashable, compute: Callable[[], Any]) -> Response:
+    """
+    Serve a payload from the public cache with ETag support.
+    Returns 304 Not Modified when the client already has this version.
+    """
+    payload, etag = public_cache.get_or_compute(key, compute)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        client_etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in client_etags or "*" in client_etags:
+            return Response(status_code=304, headers=headers)
+    
+    return JSONResponse(payload, headers=headers)
+
+
 @router.get("/today-stats")
-async def get_today_statistics(
+def get_today_statistics(
+    request: Request,
     kelas: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     Get today's attendance statistics.
     Public endpoint for display on screens/kiosks.
+    
+    Responses are cached for PUBLIC_CACHE_TTL_SECONDS and carry an ETag;
+    send it back in If-None-Match to get 304 while nothing changed.
     """
     today = date.today()
-    stats = attendance_service.get_date_statistics(db, today, kelas)
     
-    return stats
+    return _cached_response(
+        request,
+        ("today-stats", today, kelas),
+        lambda: attendance_service.get_date_statistics(db, today, kelas)
+    )
 
 
 @router.get("/latest-attendance")
-async def get_latest_attendance(
-    limit: int = 10,
+def get_latest_attendance(
+    request: Request,
+    limit: int = Query(10, ge=1, le=100),
     kelas: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """
     Get latest attendance submissions.
     Public endpoint for display on screens/kiosks.
+    
+    Responses are cached for PUBLIC_CACHE_TTL_SECONDS and carry an ETag;
+    send it back in If-None-Match to get 304 while nothing changed.
+    """
+    today = date.today()
+    
+    def compute():
+        return {
+            "total": attendance_service.count_attendance(db, today, today, kelas),
+            "latest": attendance_service.get_latest_attendance(db, limit, kelas)
+        }
+    
+    return _cached_response(request, ("latest-attendance", today, kelas, limit), compute)
+
+
+@router.get("/attendance-stream")
+async def attendance_stream(
+    request: Request,
+    kelas: Optional[str] = None
+):
     """
-    attendance_list = attendance_service.get_all_today_attendance(db, kelas)
+    Live attendance feed for display screens (Server-Sent Events).
+    Public endpoint, replaces polling /latest-attendance.
+    
+    Stream:
+    - `event: stats` once on connect with today's statistics
+    - `event: attendance` per new attendance record (filtered by `kelas`),
+      with a `delta` to apply to the statistics
+    - `: keepalive` comment lines while idle
+    """
+    # Subscribe before reading the snapshot so no event falls in between
+    subscription = attendance_broadcaster.subscribe(kelas)
+    today = date.today()
     
-    # Sort by timestamp descending and limit
-    attendance_list.sort(key=lambda x: x["timestamp"], reverse=True)
+    try:
+        stats = await run_in_threadpool(_today_stats_snapshot, today, kelas)
+    except Exception:
+        attendance_broadcaster.unsubscribe(subscription)
+        raise
+    
+    async def events():
+        try:
+            yield _sse_message("stats", stats)
+            
+            while True:
+                event = await subscription.next_event(settings.ATTENDANCE_FEED_KEEPALIVE_SECONDS)
+                
+                if event is None:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                
+                yield _sse_message("attendance", event, event["event_id"])
+        finally:
+            attendance_broadcaster.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _today_stats_snapshot(today: date, kelas: Optional[str]) -> Dict:
+    """Today's statistics through the public cache (runs in the thread pool, own DB session)."""
+    db = SessionLocal()
+    try:
+        stats, _ = public_cache.get_or_compute(
+            ("today-stats", today, kelas),
+            lambda: attendance_service.get_date_statistics(db, today, kelas)
+        )
+        return stats
+    finally:
+        db.close()
+
+
+def _sse_message(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """Format one Server-Sent Events message."""
+    lines = [f"event: {event}", f"data: {json.dumps(data, separators=(',', ':'))}"]
+    if event_id is not None:
+        lines.insert(0, f"id: {event_id}")
     
-    return {
-        "total": len(attendance_list),
-        "latest": attendance_list[:limit]
-    }
+    return "\n".join(lines) + "\n\n"
@@ -39,12 +39,52 @@ class Settings(BaseSettings):
     FACE_STORAGE_PATH: str = "./database/wajah_siswa"
     MAX_UPLOAD_SIZE_MB: int = 10
     ALLOWED_IMAGE_TYPES: List[str] = ["image/jpeg", "image/png", "image/jpg"]
+    FACE_FOLDER_SYNC: str = "background"  # startup, background (after server starts) or off
     
     # Face Recognition
+    FACE_ENGINE: str = "dlib"  # dlib (128D) or facenet (512D, needs tensorflow)
+    FACENET_SIMILARITY_THRESHOLD: float = 0.5  # Minimum cosine similarity for a FaceNet match
+    FACENET_MAX_BATCH: int = 16  # Maximum faces per FaceNet forward pass
+    # Wait for concurrent faces to batch with, 0 = no micro-batching. Only used with
+    # RECOGNITION_EXECUTOR="thread": a process worker runs one job at a time, so it never
+    # has a second face to batch with. Concurrency is capped at RECOGNITION_WORKERS.
+    FACENET_BATCH_WAIT_MS: float = 0.0
     FACE_DETECTION_MODEL: str = "hog"  # hog or cnn
+    FACE_DETECTION_SCALE: float = 0.5  # Detect on a downscaled frame (1.0 = full resolution)
     FACE_RECOGNITION_TOLERANCE: float = 0.55  # More lenient (0.4=strict, 0.6=standard)
     FACE_MIN_CONFIDENCE: float = 0.60  # 60% confidence minimum
     MIN_FACE_IMAGES: int = 3
+    FACE_ENCODING_DTYPE: str = "float32"  # float32 or float16 (storage format)
+    
+    # Scan Result Cache (near-duplicate kiosk frames)
+    SCAN_CACHE_SIZE: int = 256  # Cached results, 0 = disabled
+    SCAN_CACHE_TTL_SECONDS: float = 3.0  # How long a result is reused
+    SCAN_CACHE_MAX_DISTANCE: int = 4  # Max differing bits of the 64-bit frame hash
+    
+    # Public Display Endpoints
+    PUBLIC_CACHE_TTL_SECONDS: float = 2.0  # Cache /public responses, 0 = disabled
+    ATTENDANCE_FEED_QUEUE_SIZE: int = 100  # Pending events per live feed client (oldest dropped)
+    ATTENDANCE_FEED_KEEPALIVE_SECONDS: float = 15.0  # Comment line sent to idle feed clients
+    
+    # Streaming Scan (WebSocket kiosks)
+    STREAM_STABLE_FRAMES: int = 3  # Consecutive matching frames before a result is emitted
+    STREAM_MIN_IOU: float = 0.3  # Box overlap for consecutive frames to count as the same face
+    FACE_TRACK_MIN_IOU: float = 0.5  # Box overlap to continue a track without re-encoding
+    FACE_TRACK_REFRESH_FRAMES: int = 10  # Re-encode a tracked face every N frames
+    
+    # Face Gallery Search
+    FACE_SEARCH_MODE: str = "exact"  # exact or ivf (approximate, for large galleries)
+    FACE_IVF_NLIST: int = 0  # Number of k-means clusters, 0 = auto (4 * sqrt(N))
+    FACE_IVF_NPROBE: int = 8  # Clusters scanned per query (higher = better recall, slower)
+    FACE_IVF_MIN_GALLERY_SIZE: int = 5000  # Use exact search below this many encodings
+    
+    # Recognition Workers
+    RECOGNITION_EXECUTOR: str = "process"  # process (dlib/FaceNet off the GIL) or thread
+    RECOGNITION_WORKERS: int = 2  # Parallel recognition jobs (~ CPU cores)
+    RECOGNITION_QUEUE_SIZE: int = 8  # Jobs allowed to wait; beyond this requests get 503
+    RECOGNITION_TIMEOUT_SECONDS: int = 30
+    RECOGNITION_RETRY_AFTER_SECONDS: int = 2  # Retry-After header on 503
+    DB_THREADPOOL_SIZE: int = 40  # Threads for blocking route handlers (DB, bcrypt)
     
     # Liveness Detection
     LIVENESS_ENABLED: bool = True
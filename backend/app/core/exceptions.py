@@ -57,3 +57,25 @@ class AlreadyAttendedException(HTTPException):
     """Raised when user has already submitted attendance for today."""
     def __init__(self, detail: str = "You have already submitted attendance for today"):
         super().__init__(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+class ServiceBusyException(HTTPException):
+    """Raised when recognition workers are saturated; clients should retry later."""
+    def __init__(self, detail: str = "Server is busy, please retry shortly", retry_after: int = 2):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class PayloadTooLargeException(HTTPException):
+    """Raised when an upload exceeds MAX_UPLOAD_SIZE_MB."""
+    def __init__(self, detail: str = "Upload too large"):
+        super().__init__(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+
+class UnsupportedMediaTypeException(HTTPException):
+    """Raised when an upload has an unsupported content type."""
+    def __init__(self, detail: str = "Unsupported media type"):
+        super().__init__(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=detail)
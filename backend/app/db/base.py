@@ -11,3 +11,5 @@ from app.models.face_encoding import FaceEncoding  # noqa
 from app.models.absensi import Absensi  # noqa
 from app.models.refresh_token import RefreshToken  # noqa
 from app.models.audit_log import AuditLog  # noqa
+from app.models.face_gallery_state import FaceGalleryState  # noqa
+from app.models.daily_attendance_summary import DailyAttendanceSummary  # noqa
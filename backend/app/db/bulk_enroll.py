@@ -0,0 +1,356 @@
+"""
+Bulk face enrollment script.
+Encodes a directory of registration photos laid out as <directory>/<nim>/*.jpg
+and stores the encodings without going through the HTTP API.
+
+Usage:
+    python -m app.db.bulk_enroll [directory] [--workers 4] [--batch-size 50]
+                                 [--checkpoint path] [--restart]
+
+Photos outside FACE_STORAGE_PATH are copied (downscaled) into it, so the
+stored image paths always resolve like those of HTTP registrations. Copies
+are written to a staging folder and replace a student's stored photos only
+after the student's encodings are committed.
+
+Progress is recorded in a checkpoint file after every committed batch, so an
+interrupted run picks up where it stopped when started again.
+
+Encodings are stored for the configured FACE_ENGINE. Running it on
+FACE_STORAGE_PATH itself with another engine backfills that engine's
+encodings from the stored photos and keeps the other engines' encodings,
+so the engine can be switched without re-registering everyone:
+
+    FACE_ENGINE=facenet python -m app.db.bulk_enroll --checkpoint facenet.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import insert
+
+from app.db.session import SessionLocal
+from app.db.base import Base  # noqa - registers all models
+from app.models.user import User
+from app.models.face_encoding import FaceEncoding
+from app.core.config import settings
+from app.services.face_recognition_service import face_service
+from app.services.face_gallery_cache import face_gallery_cache
+from app.utils.image_processing import load_image
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Copied photos wait here (under FACE_STORAGE_PATH) until their batch is committed
+STAGING_DIR = "_bulk_enroll_staging"
+
+
+def find_folders(directory: str, max_images: int) -> List[Tuple[str, List[str]]]:
+    """
+    List student folders and their images.
+    
+    Args:
+        directory: Root directory with one folder per NIM
+        max_images: Maximum images used per student
+    
+    Returns:
+        List of (nim, [image paths]) sorted by NIM
+    """
+    folders = []
+    
+    with os.scandir(directory) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if not entry.is_dir() or entry.name.startswith((".", "_")):
+                continue
+            
+            images = sorted(
+                os.path.join(entry.path, name)
+                for name in os.listdir(entry.path)
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            
+            if images:
+                folders.append((entry.name, images[:max_images]))
+    
+    return folders
+
+
+def encode_folder(nim: str, paths: List[str], copy_images: bool) -> Tuple[str, List[Tuple], List[str]]:
+    """
+    Encode one student's photos (runs in a worker process).
+    
+    Args:
+        nim: Student NIM
+        paths: Image file paths
+        copy_images: Stage downscaled copies for FACE_STORAGE_PATH (see publish_staged)
+    
+    Returns:
+        Tuple of (nim, [(encoding, image_path)], [error messages])
+    """
+    encodings = []
+    errors = []
+    
+    if copy_images:
+        discard_staged(nim)
+    
+    for idx, path in enumerate(paths):
+        try:
+            with open(path, "rb") as f:
+                image_data = f.read()
+            
+            encoded = face_service.encode_image_data(image_data)
+            if encoded is None:
+                errors.append(f"{os.path.basename(path)}: no face detected")
+                continue
+            
+            if copy_images:
+                # Stored under its final path once published
+                image_path = face_service.face_image_path(nim, idx)
+                face_service.write_face_image(load_image(image_data), os.path.join(STAGING_DIR, image_path))
+            else:
+                image_path = os.path.join(nim, os.path.basename(path))
+            
+            encodings.append((encoded[0], image_path))
+        except Exception as e:
+            errors.append(f"{os.path.basename(path)}: {e}")
+    
+    return nim, encodings, errors
+
+
+def discard_staged(nim: str) -> None:
+    """Delete a student's staged photo copies."""
+    shutil.rmtree(os.path.join(settings.FACE_STORAGE_PATH, STAGING_DIR, nim), ignore_errors=True)
+
+
+def publish_staged(nim: str) -> None:
+    """Replace a student's stored photos with the staged copies (after commit)."""
+    staged = os.path.join(settings.FACE_STORAGE_PATH, STAGING_DIR, nim)
+    
+    if os.path.isdir(staged):
+        face_service.delete_user_images(nim)
+        os.replace(staged, os.path.join(settings.FACE_STORAGE_PATH, nim))
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """Read the set of already enrolled NIMs (empty if no checkpoint)."""
+    if not os.path.exists(path):
+        return set()
+    
+    with open(path, "r", encoding="utf-8") as f:
+        return set(json.load(f).get("done", []))
+
+
+def save_checkpoint(path: str, done: Set[str]) -> None:
+    """Atomically write the set of enrolled NIMs."""
+    tmp_path = f"{path}.tmp"
+    
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"done": sorted(done)}, f)
+    
+    os.replace(tmp_path, path)
+
+
+def write_batch(
+    db,
+    batch: List[Tuple[str, List[Tuple]]],
+    users: Dict[str, int],
+    engine_only: bool = False
+) -> int:
+    """
+    Upsert one batch of students' encodings in a single transaction.
+    
+    Args:
+        db: Database session
+        batch: List of (nim, [(encoding, image_path)])
+        users: {nim: user_id}
+        engine_only: Only replace encodings of the configured engine
+    
+    Returns:
+        Number of encoding rows written
+    """
+    user_ids = [users[nim] for nim, _ in batch]
+    rows = [
+        face_service.encoding_row(users[nim], encoding, image_path)
+        for nim, encodings in batch
+        for encoding, image_path in encodings
+    ]
+    
+    try:
+        query = db.query(FaceEncoding).filter(FaceEncoding.user_id.in_(user_ids))
+        if engine_only:
+            query = query.filter(FaceEncoding.model == face_service.engine.name)
+        query.delete(synchronize_session=False)
+        db.execute(insert(FaceEncoding), rows)
+        db.query(User).filter(User.id.in_(user_ids)).update(
+            {User.has_face: True},
+            synchronize_session=False
+        )
+        
+        # Tell running workers to reload their galleries
+        face_gallery_cache.bump_version(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    return len(rows)
+
+
+def bulk_enroll(
+    directory: str,
+    workers: int,
+    batch_size: int = 50,
+    checkpoint: Optional[str] = None,
+    min_images: int = settings.MIN_FACE_IMAGES,
+    max_images: int = 5,
+    restart: bool = False
+) -> None:
+    """
+    Encode and store face encodings for every student folder in directory.
+    
+    Args:
+        directory: Root directory with one folder per NIM
+        workers: Encoding processes
+        batch_size: Students per database transaction
+        checkpoint: Checkpoint file path (default: <directory>/.bulk_enroll_checkpoint.json)
+        min_images: Minimum encoded images for a student to be enrolled
+        max_images: Maximum images used per student
+        restart: Ignore an existing checkpoint
+    """
+    checkpoint = checkpoint or os.path.join(directory, ".bulk_enroll_checkpoint.json")
+    copy_images = os.path.realpath(directory) != os.path.realpath(settings.FACE_STORAGE_PATH)
+    
+    print("="*60)
+    print(f"📥 Bulk enrolling faces from {directory} ({face_service.engine.name} engine)")
+    print("="*60)
+    
+    done = set() if restart else load_checkpoint(checkpoint)
+    
+    if copy_images:
+        # Copies of an interrupted run that were never committed
+        shutil.rmtree(os.path.join(settings.FACE_STORAGE_PATH, STAGING_DIR), ignore_errors=True)
+    folders = [(nim, paths) for nim, paths in find_folders(directory, max_images) if nim not in done]
+    
+    if done:
+        print(f"↩️ Resuming: {len(done)} students already enrolled (checkpoint {checkpoint})")
+    
+    db = SessionLocal()
+    try:
+        # Look up users with batched IN queries instead of one query per folder
+        nims = [nim for nim, _ in folders]
+        users: Dict[str, int] = {}
+        for start in range(0, len(nims), 500):
+            users.update(db.query(User.nim, User.id).filter(User.nim.in_(nims[start:start + 500])).all())
+        
+        unknown = [nim for nim in nims if nim not in users]
+        for nim in unknown:
+            print(f"  ⚠️ {nim}: no user with this NIM, skipped")
+        folders = [(nim, paths) for nim, paths in folders if nim in users]
+        
+        total_images = sum(len(paths) for _, paths in folders)
+        print(f"🧠 Encoding {total_images} images of {len(folders)} students with {workers} workers...")
+        
+        enrolled = 0
+        skipped = 0
+        images_done = 0
+        rows_written = 0
+        batch: List[Tuple[str, List[Tuple]]] = []
+        started = time.perf_counter()
+        
+        def flush() -> None:
+            nonlocal rows_written
+            # Photos stay in place: other engines' encodings of them remain valid
+            rows_written += write_batch(db, batch, users, engine_only=not copy_images)
+            if copy_images:
+                for nim, _ in batch:
+                    publish_staged(nim)
+            done.update(nim for nim, _ in batch)
+            save_checkpoint(checkpoint, done)
+            batch.clear()
+            
+            elapsed = time.perf_counter() - started
+            print(f"  ✓ {enrolled}/{len(folders)} students, {images_done}/{total_images} images "
+                  f"({images_done / elapsed:.1f} images/s, {enrolled / elapsed:.1f} students/s)")
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            queue = iter(folders)
+            
+            while True:
+                # Keep a bounded number of folders in flight
+                while len(pending) < workers * 4:
+                    item = next(queue, None)
+                    if item is None:
+                        break
+                    pending.add(executor.submit(encode_folder, item[0], item[1], copy_images))
+                
+                if not pending:
+                    break
+                
+                completed, pending = wait(pending, return_when=FIRST_COMPLETED)
+                
+                for future in completed:
+                    nim, encodings, errors = future.result()
+                    images_done += len(encodings) + len(errors)
+                    
+                    for error in errors:
+                        print(f"  ⚠️ {nim}: {error}")
+                    
+                    if len(encodings) < min_images:
+                        # Stored photos stay, they still match the student's encodings
+                        print(f"  ⚠️ {nim}: only {len(encodings)} usable images (need {min_images}), skipped")
+                        if copy_images:
+                            discard_staged(nim)
+                        skipped += 1
+                        continue
+                    
+                    batch.append((nim, encodings))
+                    enrolled += 1
+                
+                if len(batch) >= batch_size:
+                    flush()
+        
+        if batch:
+            flush()
+        
+        if copy_images:
+            shutil.rmtree(os.path.join(settings.FACE_STORAGE_PATH, STAGING_DIR), ignore_errors=True)
+        
+        elapsed = time.perf_counter() - started
+        print("="*60)
+        print(f"✅ Enrolled {enrolled} students ({rows_written} encodings), "
+              f"skipped {skipped + len(unknown)}, in {elapsed:.1f}s")
+        if elapsed > 0:
+            print(f"   Throughput: {images_done / elapsed:.1f} images/s")
+        print("="*60)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk enroll faces from a directory of <nim>/ photo folders")
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        default=settings.FACE_STORAGE_PATH,
+        help="Root directory with one folder per NIM (default: FACE_STORAGE_PATH)"
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Encoding processes")
+    parser.add_argument("--batch-size", type=int, default=50, help="Students per transaction")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file path")
+    parser.add_argument("--min-images", type=int, default=settings.MIN_FACE_IMAGES, help="Minimum usable images per student")
+    parser.add_argument("--max-images", type=int, default=5, help="Maximum images used per student")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+    
+    bulk_enroll(
+        args.directory,
+        workers=max(1, args.workers),
+        batch_size=max(1, args.batch_size),
+        checkpoint=args.checkpoint,
+        min_images=args.min_images,
+        max_images=args.max_images,
+        restart=args.restart
+    )
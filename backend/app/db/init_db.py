@@ -7,6 +7,7 @@ import os
 from sqlalchemy.orm import Session
 from app.db.session import engine, SessionLocal
 from app.db.base import Base
+from app.db.schema import upgrade_schema
 from app.models.user import User
 from app.core.security import get_password_hash
 from app.core.config import settings
@@ -16,6 +17,8 @@ def create_tables():
     """Create all database tables."""
     print("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    for upgrade in upgrade_schema(engine):
+        print(f"   + {upgrade}")
     print("✅ Tables created successfully!")
 
 
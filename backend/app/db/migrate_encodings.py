@@ -0,0 +1,109 @@
+"""
+Face encoding migration script.
+Rewrites stored face encodings in another storage dtype (e.g. float16).
+Legacy pickled encodings are converted automatically at startup (app.db.schema).
+
+Usage:
+    python -m app.db.migrate_encodings [--dtype float32|float16] [--batch-size 500]
+"""
+
+import argparse
+from app.db.session import SessionLocal
+from app.db.base import Base  # noqa - registers all models
+from app.models.face_encoding import FaceEncoding
+from app.core.config import settings
+from app.services.face_gallery_cache import face_gallery_cache
+from app.utils.embedding_codec import (
+    encode_embedding,
+    decode_embedding,
+    decode_legacy_embedding,
+    is_binary_embedding
+)
+
+
+def migrate_encodings(dtype: str, batch_size: int = 500) -> None:
+    """
+    Rewrite every face encoding row in the binary format.
+    
+    Args:
+        dtype: Target storage dtype ("float32" or "float16")
+        batch_size: Rows per transaction
+    """
+    print("="*60)
+    print(f"🔄 Migrating face encodings to binary {dtype} format...")
+    print("="*60)
+    
+    db = SessionLocal()
+    try:
+        total = db.query(FaceEncoding).count()
+        converted = 0
+        skipped = 0
+        failed = 0
+        bytes_before = 0
+        bytes_after = 0
+        last_id = 0
+        
+        while True:
+            # Keyset pagination so rewritten rows are never re-read
+            rows = db.query(FaceEncoding).filter(
+                FaceEncoding.id > last_id
+            ).order_by(FaceEncoding.id).limit(batch_size).all()
+            
+            if not rows:
+                break
+            
+            for row in rows:
+                data = row.encoding_data
+                bytes_before += len(data)
+                
+                try:
+                    if is_binary_embedding(data):
+                        encoding = decode_embedding(data)
+                        if encoding.dtype.name == dtype:
+                            skipped += 1
+                            bytes_after += len(data)
+                            continue
+                    else:
+                        encoding = decode_legacy_embedding(data)
+                    
+                    row.encoding_data = encode_embedding(encoding, dtype)
+                    bytes_after += len(row.encoding_data)
+                    converted += 1
+                except Exception as e:
+                    print(f"  ⚠️ Failed to convert encoding {row.id} (user {row.user_id}): {e}")
+                    bytes_after += len(data)
+                    failed += 1
+            
+            last_id = rows[-1].id
+            db.commit()
+            db.expunge_all()
+            print(f"  ✓ Processed {converted + skipped + failed}/{total} rows")
+        
+        # Tell running workers to reload their galleries
+        if converted:
+            face_gallery_cache.bump_version(db)
+            db.commit()
+        
+        print("="*60)
+        print(f"✅ Converted {converted}, already up to date {skipped}, failed {failed}")
+        print(f"   Storage: {bytes_before:,} → {bytes_after:,} bytes")
+        print("="*60)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate face encodings to binary format")
+    parser.add_argument(
+        "--dtype",
+        choices=["float32", "float16"],
+        default=settings.FACE_ENCODING_DTYPE,
+        help="Storage dtype for embeddings"
+    )
+    parser.add_argument("--batch-size", type=int, default=500, help="Rows per transaction")
+    args = parser.parse_args()
+    
+    migrate_encodings(args.dtype, args.batch_size)
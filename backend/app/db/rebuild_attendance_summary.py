@@ -0,0 +1,49 @@
+"""
+Daily attendance summary rebuild script.
+Recomputes the daily_attendance_summary table from the attendance records,
+e.g. after importing historical data or editing records directly in the database.
+
+Usage:
+    python -m app.db.rebuild_attendance_summary [--from 2024-01-01] [--to 2024-12-31]
+"""
+
+import argparse
+from datetime import date
+from app.db.session import SessionLocal
+from app.db.base import Base  # noqa - registers all models
+from app.services.attendance_service import attendance_service
+
+
+def rebuild_attendance_summary(start_date: date = None, end_date: date = None) -> None:
+    """
+    Rebuild the summary rows of a date range (default: all dates).
+    
+    Args:
+        start_date: First date to rebuild
+        end_date: Last date to rebuild
+    """
+    print("="*60)
+    print(f"🔄 Rebuilding daily attendance summary ({start_date or 'first day'} - {end_date or 'today'})...")
+    print("="*60)
+    
+    db = SessionLocal()
+    try:
+        rows = attendance_service.rebuild_daily_summary(db, start_date, end_date)
+        db.commit()
+        
+        print(f"✅ Wrote {rows} summary rows")
+        print("="*60)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily attendance summary")
+    parser.add_argument("--from", dest="start_date", type=date.fromisoformat, default=None, help="First date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", type=date.fromisoformat, default=None, help="Last date (YYYY-MM-DD)")
+    args = parser.parse_args()
+    
+    rebuild_attendance_summary(args.start_date, args.end_date)
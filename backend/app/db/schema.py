@@ -0,0 +1,98 @@
+"""
+Lightweight schema upgrades.
+
+Base.metadata.create_all() only creates missing tables. Columns added to
+existing models are listed here and added with ALTER TABLE at startup,
+so existing SQLite databases keep working without a migration tool.
+Face encodings still stored as pickles are rewritten in the binary format.
+"""
+
+from typing import Dict, List, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+from app.utils.embedding_codec import MAGIC, decode_legacy_embedding, encode_embedding
+
+# {table: [(column, column definition)]}, definitions need a default for existing rows
+ADDED_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    "face_encodings": [
+        ("model", "VARCHAR(32) NOT NULL DEFAULT 'dlib'"),
+        ("dimension", "INTEGER NOT NULL DEFAULT 128"),
+    ],
+}
+
+# (index, table, column)
+ADDED_INDEXES: List[Tuple[str, str, str]] = [
+    ("ix_face_encodings_model", "face_encodings", "model"),
+]
+
+
+def convert_legacy_encodings(conn: Connection) -> int:
+    """
+    Rewrite pickled face encodings in the binary embedding format.
+    Rows that cannot be converted are reported and left out of the gallery.
+    
+    Args:
+        conn: Connection inside a transaction
+    
+    Returns:
+        Number of rows converted
+    """
+    rows = conn.execute(
+        text("SELECT id, user_id, encoding_data FROM face_encodings WHERE substr(encoding_data, 1, :size) != :magic"),
+        {"size": len(MAGIC), "magic": MAGIC}
+    ).all()
+    
+    converted = []
+    for row in rows:
+        try:
+            encoding = decode_legacy_embedding(row.encoding_data)
+            converted.append({"id": row.id, "data": encode_embedding(encoding, settings.FACE_ENCODING_DTYPE)})
+        except Exception as e:
+            print(f"⚠️ Face encoding {row.id} (user {row.user_id}) could not be converted: {e}")
+    
+    if converted:
+        conn.execute(text("UPDATE face_encodings SET encoding_data = :data WHERE id = :id"), converted)
+        # Tell running workers to reload their galleries
+        conn.execute(text("UPDATE face_gallery_state SET version = version + 1"))
+    
+    return len(converted)
+
+
+def upgrade_schema(engine: Engine) -> List[str]:
+    """
+    Add missing columns and indexes to existing tables and convert
+    legacy face encodings.
+    
+    Args:
+        engine: SQLAlchemy engine
+    
+    Returns:
+        List of applied upgrades ("table.column" names and conversions)
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    added = []
+    
+    with engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            if table not in tables:
+                continue
+            
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, definition in columns:
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {definition}"))
+                    added.append(f"{table}.{name}")
+        
+        for index, table, column in ADDED_INDEXES:
+            if table in tables:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})"))
+        
+        if "face_encodings" in tables and "face_gallery_state" in tables:
+            converted = convert_legacy_encodings(conn)
+            if converted:
+                added.append(f"face_encodings.encoding_data ({converted} pickled rows converted)")
+    
+    return added
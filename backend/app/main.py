@@ -7,10 +7,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import anyio
 
 from app.core.config import settings
 from app.db.session import engine
 from app.db.base import Base
+from app.db.schema import upgrade_schema
+from app.services.attendance_events import attendance_broadcaster
+from app.services.public_cache import public_cache
+from app.services.recognition_cache import recognition_cache
+from app.services.recognition_executor import recognition_executor
 
 # Import routes
 from app.api.v1 import auth, face, absensi, admin, public
@@ -28,13 +34,21 @@ async def lifespan(app: FastAPI):
     
     # Create database tables if they don't exist
     Base.metadata.create_all(bind=engine)
+    upgrades = upgrade_schema(engine)
+    if upgrades:
+        print(f"🔧 Schema upgraded: {', '.join(upgrades)}")
     print("✅ Database tables ready")
     
+    # Blocking route handlers (DB, bcrypt) run in AnyIO's thread pool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.DB_THREADPOOL_SIZE
+    
+    # Face detection/encoding runs in a separate bounded worker pool
+    recognition_executor.start()
+    
     # Import dependencies
     from app.db.session import SessionLocal
     from app.models.user import User
     from app.core.security import get_password_hash
-    import os
     
     db = SessionLocal()
     try:
@@ -60,39 +74,57 @@ async def lifespan(app: FastAPI):
             print("   ⚠️  Please change the password after first login!")
         else:
             print("✅ Admin user exists")
-        
-        # === SYNC FACE STATUS ===
-        face_storage_path = settings.FACE_STORAGE_PATH
-        if os.path.exists(face_storage_path):
-            # Get all user folders (NIM folders)
-            user_folders = [f for f in os.listdir(face_storage_path) 
-                          if os.path.isdir(os.path.join(face_storage_path, f))]
-            
-            # Update has_face for users with existing folders
-            for nim_folder in user_folders:
-                folder_path = os.path.join(face_storage_path, nim_folder)
-                # Check if folder has at least 3 images
-                images = [f for f in os.listdir(folder_path) 
-                         if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-                
-                if len(images) >= 3:
-                    # Update user has_face = True
-                    user = db.query(User).filter(User.nim == nim_folder).first()
-                    if user and not user.has_face:
-                        user.has_face = True
-                        print(f"  ✓ Synced has_face for {nim_folder} ({len(images)} images)")
-            
+    except Exception as e:
+        print(f"⚠️ Error creating admin user: {e}")
+        db.rollback()
+    finally:
+        db.close()
+    
+    # === ATTENDANCE SUMMARY ===
+    # Databases created before the daily summary existed get it built once
+    from app.models.absensi import Absensi
+    from app.models.daily_attendance_summary import DailyAttendanceSummary
+    from app.services.attendance_service import attendance_service
+    
+    db = SessionLocal()
+    try:
+        if db.query(DailyAttendanceSummary.id).first() is None and db.query(Absensi.id).first() is not None:
+            rows = attendance_service.rebuild_daily_summary(db)
             db.commit()
-            print(f"✅ Face registration status synced from {len(user_folders)} folders")
+            print(f"✅ Daily attendance summary built: {rows} rows")
     except Exception as e:
-        print(f"⚠️ Error syncing face status: {e}")
+        print(f"⚠️ Error building attendance summary: {e}")
         db.rollback()
     finally:
         db.close()
     
+    # === SYNC FACE STATUS ===
+    # Only folders changed since the last run (per manifest) are inspected
+    from app.services.face_folder_sync import face_folder_sync
+    
+    if settings.FACE_FOLDER_SYNC == "startup":
+        face_folder_sync.run()
+    
+    # === LOAD FACE GALLERY ===
+    # Build the in-memory gallery once; register/unregister patch it afterwards
+    from app.services.face_gallery_cache import face_gallery_cache
+    
+    db = SessionLocal()
+    try:
+        face_gallery_cache.load(db)
+    except Exception as e:
+        print(f"⚠️ Error loading face gallery: {e}")
+    finally:
+        db.close()
+    
+    # Sync after startup instead, while requests are already being served
+    if settings.FACE_FOLDER_SYNC == "background":
+        face_folder_sync.start_background()
+    
     yield
     
     # Shutdown
+    recognition_executor.shutdown()
     print("="*60)
     print(f"👋 Shutting down {settings.APP_NAME}")
     print("="*60)
@@ -142,7 +174,11 @@ async def health_check():
     return {
         "status": "healthy",
         "app": settings.APP_NAME,
-        "version": settings.APP_VERSION
+        "version": settings.APP_VERSION,
+        "recognition": recognition_executor.stats(),
+        "scan_cache": recognition_cache.stats(),
+        "public_cache": public_cache.stats(),
+        "attendance_feed": attendance_broadcaster.stats()
     }
 
 
@@ -0,0 +1,27 @@
+"""
+DailyAttendanceSummary model with pre-aggregated attendance counts.
+"""
+
+from sqlalchemy import Column, Integer, String, Date, UniqueConstraint
+from app.db.session import Base
+
+# Stored for students without a class: the unique constraint treats NULLs as distinct
+NO_CLASS = ""
+
+
+class DailyAttendanceSummary(Base):
+    __tablename__ = "daily_attendance_summary"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    date = Column(Date, nullable=False, index=True)
+    kelas = Column(String(50), nullable=False, default=NO_CLASS)  # Class of the students (User.kelas)
+    status = Column(String(20), nullable=False)  # hadir, terlambat, ...
+    count = Column(Integer, nullable=False, default=0)  # Attendance records with this status
+    
+    # One row per day, class and status
+    __table_args__ = (
+        UniqueConstraint('date', 'kelas', 'status', name='uix_summary_date_kelas_status'),
+    )
+    
+    def __repr__(self):
+        return f"<DailyAttendanceSummary(date={self.date}, kelas={self.kelas}, status={self.status}, count={self.count})>"
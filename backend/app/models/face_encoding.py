@@ -13,7 +13,9 @@ class FaceEncoding(Base):
     
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    encoding_data = Column(LargeBinary, nullable=False)  # Pickled numpy array
+    encoding_data = Column(LargeBinary, nullable=False)  # Binary embedding (app.utils.embedding_codec)
+    model = Column(String(32), nullable=False, default="dlib", server_default="dlib", index=True)  # Engine that produced it
+    dimension = Column(Integer, nullable=False, default=128, server_default="128")  # Embedding length
     image_path = Column(String(255), nullable=True)  # Path to original image
     confidence = Column(Float, nullable=True)  # Quality score of the encoding
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -22,4 +24,4 @@ class FaceEncoding(Base):
     user = relationship("User", back_populates="face_encodings")
     
     def __repr__(self):
-        return f"<FaceEncoding(id={self.id}, user_id={self.user_id})>"
+        return f"<FaceEncoding(id={self.id}, user_id={self.user_id}, model={self.model})>"
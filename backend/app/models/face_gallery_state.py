@@ -0,0 +1,18 @@
+"""
+FaceGalleryState model for tracking face gallery changes across workers.
+"""
+
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.db.session import Base
+
+
+class FaceGalleryState(Base):
+    __tablename__ = "face_gallery_state"
+    
+    id = Column(Integer, primary_key=True)  # Single row (id=1)
+    version = Column(Integer, nullable=False, default=0)  # Bumped on every encoding change
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<FaceGalleryState(version={self.version})>"
@@ -2,10 +2,12 @@
 Absensi (attendance) related schemas.
 """
 
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import date, datetime
 
+from app.schemas.common import ClassFilter
+
 
 class AbsensiSubmitRequest(BaseModel):
     """Schema for submitting attendance."""
@@ -19,6 +21,43 @@ class AbsensiSubmitRequest(BaseModel):
         }
 
 
+class ClassroomSnapshotRequest(BaseModel):
+    """Schema for submitting attendance from one classroom photo."""
+    image_base64: str = Field(..., description="Base64 encoded classroom photo")
+    kelas: ClassFilter = None
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "image_base64": "data:image/jpeg;base64,/9j/4AAQSkZJRg...",
+                "kelas": ["TI-3A"]
+            }
+        }
+
+
+class ClassroomFaceResult(BaseModel):
+    """Result for one face detected in a classroom photo."""
+    face_location: List[int] = Field(..., description="[top, right, bottom, left]")
+    recognized: bool
+    confidence: float = 0.0
+    user_id: Optional[int] = None
+    nim: Optional[str] = None
+    name: Optional[str] = None
+    kelas: Optional[str] = None
+    attendance_id: Optional[int] = None
+    status: Optional[str] = None
+    already_submitted: Optional[bool] = False
+
+
+class ClassroomSnapshotResponse(BaseModel):
+    """Response for classroom photo attendance."""
+    faces_detected: int
+    recognized_count: int
+    submitted_count: int
+    faces: List[ClassroomFaceResult]
+    message: Optional[str] = None
+
+
 class AbsensiResponse(BaseModel):
     """Schema for attendance response."""
     id: int
@@ -2,13 +2,28 @@
 Common schemas used across the application.
 """
 
-from typing import Optional, Generic, TypeVar, List
-from pydantic import BaseModel
+from typing import Annotated, Optional, Generic, TypeVar, List
+from pydantic import BaseModel, BeforeValidator, Field
 from datetime import datetime
 
 T = TypeVar("T")
 
 
+def _split_class_names(value):
+    """Accept a single class name as well as a list."""
+    if isinstance(value, str):
+        return [value] if value else None
+    return value
+
+
+# Optional class filter of face matching requests
+ClassFilter = Annotated[
+    Optional[List[str]],
+    BeforeValidator(_split_class_names),
+    Field(description="Restrict matching to these classes first (falls back to all faces)")
+]
+
+
 class ResponseBase(BaseModel):
     """Base response model."""
     success: bool = True
@@ -5,15 +5,19 @@ Face recognition related schemas.
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
+from app.schemas.common import ClassFilter
+
 
 class FaceScanRequest(BaseModel):
     """Schema for face scanning request."""
     image_base64: str = Field(..., description="Base64 encoded image")
+    kelas: ClassFilter = None
     
     class Config:
         json_schema_extra = {
             "example": {
-                "image_base64": "data:image/jpeg;base64,/9j/4AAQSkZJRg..."
+                "image_base64": "data:image/jpeg;base64,/9j/4AAQSkZJRg...",
+                "kelas": ["TI-3A"]
             }
         }
 
@@ -26,9 +30,41 @@ class FaceScanResponse(BaseModel):
     name: Optional[str] = None
     kelas: Optional[str] = None
     confidence: float = 0.0
+    face_location: Optional[List[int]] = Field(
+        None,
+        description="Box of the face used for recognition: [top, right, bottom, left]"
+    )
     message: Optional[str] = None
 
 
+class FaceScanBatchRequest(BaseModel):
+    """Schema for scanning several frames in one request."""
+    images_base64: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=16,
+        description="List of base64 encoded images (maximum 16)"
+    )
+    kelas: ClassFilter = None
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "images_base64": [
+                    "data:image/jpeg;base64,/9j/4AAQSkZJRg...",
+                    "data:image/jpeg;base64,/9j/4AAQSkZJRg..."
+                ],
+                "kelas": ["TI-3A"]
+            }
+        }
+
+
+class FaceScanBatchResponse(BaseModel):
+    """Response for batch face scanning, one result per image in request order."""
+    results: List[FaceScanResponse]
+    recognized_count: int = 0
+
+
 class FaceRegisterRequest(BaseModel):
     """Schema for face registration request."""
     images_base64: List[str] = Field(
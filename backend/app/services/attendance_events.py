@@ -0,0 +1,122 @@
+"""
+Attendance Events
+In-process broadcaster behind the live attendance feed (/public/attendance-stream).
+
+AttendanceService publishes one event per committed attendance record.
+Every connected display holds a subscription with a bounded queue; when a
+slow client falls behind, its oldest events are dropped instead of
+letting the queue grow. Publishing happens in the request's worker
+thread and is handed to each subscriber's event loop thread-safely.
+
+Events only reach subscribers connected to the same process, so with
+several uvicorn workers a display only sees submissions handled by its
+own worker (it can re-read /public/today-stats to catch up).
+"""
+
+import asyncio
+import itertools
+import threading
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+class AttendanceSubscription:
+    """One connected display: class filter and bounded event queue."""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, kelas: Optional[str] = None, queue_size: int = 100):
+        self.loop = loop
+        self.kelas = kelas
+        self.queue: "asyncio.Queue[Dict]" = asyncio.Queue(maxsize=max(1, queue_size))
+        self.dropped = 0
+    
+    def wants(self, event: Dict) -> bool:
+        """Check the event against the class filter."""
+        return self.kelas is None or event.get("kelas") == self.kelas
+    
+    def offer(self, event: Dict) -> None:
+        """Queue an event, dropping the oldest one if the client is behind (loop thread)."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        
+        self.queue.put_nowait(event)
+    
+    async def next_event(self, timeout: float) -> Optional[Dict]:
+        """Wait for the next event, or None after timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class AttendanceBroadcaster:
+    """Fan-out of attendance events to all subscriptions of this process."""
+    
+    def __init__(self):
+        self._subscriptions: List[AttendanceSubscription] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+    
+    def subscribe(self, kelas: Optional[str] = None) -> AttendanceSubscription:
+        """
+        Register a subscription on the running event loop.
+        
+        Args:
+            kelas: Only receive events of this class (optional)
+        
+        Returns:
+            AttendanceSubscription
+        """
+        subscription = AttendanceSubscription(
+            asyncio.get_running_loop(),
+            kelas,
+            settings.ATTENDANCE_FEED_QUEUE_SIZE
+        )
+        
+        with self._lock:
+            self._subscriptions = self._subscriptions + [subscription]
+        
+        return subscription
+    
+    def unsubscribe(self, subscription: AttendanceSubscription) -> None:
+        """Remove a subscription (client disconnected)."""
+        with self._lock:
+            self._subscriptions = [s for s in self._subscriptions if s is not subscription]
+    
+    def publish(self, events: List[Dict]) -> None:
+        """
+        Deliver events to every matching subscription. Safe to call from any thread.
+        
+        Args:
+            events: Event dictionaries (JSON-compatible, with a "kelas" key)
+        """
+        subscriptions = self._subscriptions
+        
+        for event in events:
+            event["event_id"] = next(self._ids)
+            self.published += 1
+            
+            for subscription in subscriptions:
+                if not subscription.wants(event):
+                    continue
+                
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.offer, event)
+                except RuntimeError:
+                    # Event loop already closed
+                    self.unsubscribe(subscription)
+    
+    def stats(self) -> Dict:
+        """Subscriber and event counters."""
+        subscriptions = self._subscriptions
+        return {
+            "subscribers": len(subscriptions),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subscriptions)
+        }
+
+
+# Global broadcaster instance
+attendance_broadcaster = AttendanceBroadcaster()
@@ -4,20 +4,26 @@ Handles attendance submission, history, and statistics.
 """
 
 from datetime import datetime, date, time, timedelta
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, desc
+from sqlalchemy import func, and_, desc, insert
+from sqlalchemy.dialects import postgresql, sqlite
 
 from app.models.absensi import Absensi
+from app.models.daily_attendance_summary import DailyAttendanceSummary, NO_CLASS
 from app.models.user import User
 from app.core.config import settings
-from app.core.exceptions import BadRequestException, DuplicateException
+from app.core.exceptions import BadRequestException
+from app.services.attendance_events import attendance_broadcaster
+from app.services.public_cache import public_cache
 from app.utils.helpers import get_current_time_status
 
 
 class AttendanceService:
     """Service for managing attendance records."""
     
+    STREAK_MAX_DAYS = 30
+    
     def submit_attendance(
         self,
         db: Session,
@@ -66,11 +72,133 @@ class AttendanceService:
         )
         
         db.add(attendance)
+        
+        # Keep the daily summary in the same transaction
+        user = db.query(User.id, User.nim, User.name, User.kelas).filter(User.id == user_id).first()
+        self._add_to_summary(db, {(today, user.kelas if user else None, status): 1})
+        
         db.commit()
         db.refresh(attendance)
+        public_cache.invalidate()
+        attendance_broadcaster.publish([self._attendance_event(attendance, user)])
         
         return attendance, False  # (attendance, is_duplicate)
     
+    def submit_attendance_bulk(
+        self,
+        db: Session,
+        entries: List[Tuple[int, float]],
+        image_path: str
+    ) -> Dict[int, Tuple[Absensi, bool]]:
+        """
+        Submit attendance for several users in one transaction.
+        
+        Args:
+            db: Database session
+            entries: List of (user_id, confidence); a user listed twice keeps
+                the highest confidence
+            image_path: Path to the shared attendance image
+            
+        Returns:
+            Dictionary {user_id: (attendance, is_duplicate)}
+        """
+        best: Dict[int, float] = {}
+        for user_id, confidence in entries:
+            best[user_id] = max(confidence, best.get(user_id, 0.0))
+        
+        if not best:
+            return {}
+        
+        today = date.today()
+        
+        # One query for everyone who already submitted today
+        existing = db.query(Absensi).filter(
+            and_(
+                Absensi.user_id.in_(best.keys()),
+                Absensi.date == today
+            )
+        ).all()
+        
+        results = {attendance.user_id: (attendance, True) for attendance in existing}
+        
+        # Same status and timestamp for the whole snapshot
+        status = get_current_time_status()
+        now = datetime.now()
+        
+        created = []
+        for user_id, confidence in best.items():
+            if user_id in results:
+                continue
+            
+            attendance = Absensi(
+                user_id=user_id,
+                date=today,
+                timestamp=now,
+                status=status,
+                confidence=confidence,
+                image_path=image_path
+            )
+            db.add(attendance)
+            created.append(attendance)
+            results[user_id] = (attendance, False)
+        
+        users = {}
+        if created:
+            users = {
+                user.id: user
+                for user in db.query(User.id, User.nim, User.name, User.kelas).filter(
+                    User.id.in_([a.user_id for a in created])
+                ).all()
+            }
+            summary: Dict[Tuple, int] = {}
+            for attendance in created:
+                user = users.get(attendance.user_id)
+                key = (today, user.kelas if user else None, status)
+                summary[key] = summary.get(key, 0) + 1
+            self._add_to_summary(db, summary)
+        
+        db.commit()
+        
+        for attendance in created:
+            db.refresh(attendance)
+        
+        if created:
+            public_cache.invalidate()
+            attendance_broadcaster.publish([
+                self._attendance_event(attendance, users.get(attendance.user_id))
+                for attendance in created
+            ])
+        
+        return results
+    
+    def _attendance_event(self, attendance: Absensi, user) -> Dict:
+        """
+        Build the live feed event of a committed attendance record.
+        
+        Args:
+            attendance: Attendance record
+            user: Row with id, nim, name and kelas of the user (or None)
+            
+        Returns:
+            Event dictionary with the record and the statistics delta
+        """
+        return {
+            "type": "attendance",
+            "id": attendance.id,
+            "user_id": attendance.user_id,
+            "nim": user.nim if user else None,
+            "name": user.name if user else None,
+            "kelas": user.kelas if user else None,
+            "timestamp": attendance.timestamp.isoformat() if attendance.timestamp else None,
+            "status": attendance.status,
+            "confidence": attendance.confidence,
+            "delta": {
+                "total_present": 1,
+                f"total_{attendance.status}": 1,
+                "total_absent": -1
+            }
+        }
+    
     def get_user_attendance_history(
         self,
         db: Session,
@@ -143,7 +271,7 @@ class AttendanceService:
         Returns:
             Dictionary with statistics
         """
-        query = db.query(Absensi).filter(Absensi.user_id == user_id)
+        query = db.query(Absensi.status, func.count(Absensi.id)).filter(Absensi.user_id == user_id)
         
         if start_date:
             query = query.filter(Absensi.date >= start_date)
@@ -151,11 +279,12 @@ class AttendanceService:
         if end_date:
             query = query.filter(Absensi.date <= end_date)
         
-        # Count by status
-        total = query.count()
-        hadir = query.filter(Absensi.status == "hadir").count()
-        terlambat = query.filter(Absensi.status == "terlambat").count()
-        tidak_hadir = query.filter(Absensi.status == "tidak_hadir").count()
+        # Count by status in one aggregate query
+        counts = dict(query.group_by(Absensi.status).all())
+        total = sum(counts.values())
+        hadir = counts.get("hadir", 0)
+        terlambat = counts.get("terlambat", 0)
+        tidak_hadir = counts.get("tidak_hadir", 0)
         
         # Calculate attendance rate based on (hadir + terlambat) / total
         total_days = self._get_total_days(start_date, end_date)
@@ -173,6 +302,77 @@ class AttendanceService:
             "current_streak": current_streak
         }
     
+    def get_users_statistics(
+        self,
+        db: Session,
+        user_ids: List[int],
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+    ) -> Dict[int, Dict]:
+        """
+        Get attendance statistics of many users with set-based queries.
+        Same values as get_user_statistics, but one grouped count query and
+        one streak query for all users instead of ~6 queries per user.
+        
+        Args:
+            db: Database session
+            user_ids: User IDs
+            start_date: Start date for calculation (optional)
+            end_date: End date for calculation (optional)
+            
+        Returns:
+            Dictionary {user_id: statistics}
+        """
+        counts: Dict[int, Dict[str, int]] = {user_id: {} for user_id in user_ids}
+        dates: Dict[int, List[date]] = {user_id: [] for user_id in user_ids}
+        today = date.today()
+        
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            
+            query = db.query(Absensi.user_id, Absensi.status, func.count(Absensi.id)).filter(
+                Absensi.user_id.in_(chunk)
+            )
+            if start_date:
+                query = query.filter(Absensi.date >= start_date)
+            if end_date:
+                query = query.filter(Absensi.date <= end_date)
+            
+            for user_id, status, count in query.group_by(Absensi.user_id, Absensi.status).all():
+                counts[user_id][status] = count
+            
+            # Attendance dates inside the streak window, newest first per user
+            streak_rows = db.query(Absensi.user_id, Absensi.date).filter(
+                and_(
+                    Absensi.user_id.in_(chunk),
+                    Absensi.date <= today,
+                    Absensi.date > today - timedelta(days=self.STREAK_MAX_DAYS)
+                )
+            ).distinct().order_by(Absensi.user_id, desc(Absensi.date)).all()
+            
+            for user_id, attendance_date in streak_rows:
+                dates[user_id].append(attendance_date)
+        
+        total_days = self._get_total_days(start_date, end_date)
+        results = {}
+        
+        for user_id in user_ids:
+            user_counts = counts[user_id]
+            hadir = user_counts.get("hadir", 0)
+            terlambat = user_counts.get("terlambat", 0)
+            attendance_rate = ((hadir + terlambat) / total_days * 100) if total_days > 0 else 0.0
+            
+            results[user_id] = {
+                "total_attendance": sum(user_counts.values()),
+                "total_hadir": hadir,
+                "total_terlambat": terlambat,
+                "total_tidak_hadir": user_counts.get("tidak_hadir", 0),
+                "attendance_rate": round(attendance_rate, 2),
+                "current_streak": self._streak_from_dates(dates[user_id], today)
+            }
+        
+        return results
+    
     def get_all_today_attendance(
         self,
         db: Session,
@@ -211,6 +411,44 @@ class AttendanceService:
             for absensi, user in results
         ]
     
+    def get_latest_attendance(
+        self,
+        db: Session,
+        limit: int = 10,
+        kelas: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Get today's most recent attendance records.
+        
+        Args:
+            db: Database session
+            limit: Maximum number of records
+            kelas: Filter by class (optional)
+            
+        Returns:
+            List of attendance records with user info, newest first
+        """
+        query = db.query(Absensi, User).join(User).filter(Absensi.date == date.today())
+        
+        if kelas:
+            query = query.filter(User.kelas == kelas)
+        
+        results = query.order_by(desc(Absensi.timestamp)).limit(limit).all()
+        
+        return [
+            {
+                "id": absensi.id,
+                "user_id": user.id,
+                "nim": user.nim,
+                "name": user.name,
+                "kelas": user.kelas,
+                "timestamp": absensi.timestamp,
+                "status": absensi.status,
+                "confidence": absensi.confidence
+            }
+            for absensi, user in results
+        ]
+    
     def get_date_statistics(
         self,
         db: Session,
@@ -234,14 +472,18 @@ class AttendanceService:
             user_query = user_query.filter(User.kelas == kelas)
         total_students = user_query.count()
         
-        # Get attendance count
-        attendance_query = db.query(Absensi).join(User).filter(Absensi.date == target_date)
+        # Attendance counts from the pre-aggregated daily summary (O(classes) rows)
+        summary_query = db.query(
+            DailyAttendanceSummary.status,
+            func.sum(DailyAttendanceSummary.count)
+        ).filter(DailyAttendanceSummary.date == target_date)
         if kelas:
-            attendance_query = attendance_query.filter(User.kelas == kelas)
+            summary_query = summary_query.filter(DailyAttendanceSummary.kelas == kelas)
         
-        total_present = attendance_query.count()
-        total_hadir = attendance_query.filter(Absensi.status == "hadir").count()
-        total_terlambat = attendance_query.filter(Absensi.status == "terlambat").count()
+        counts = dict(summary_query.group_by(DailyAttendanceSummary.status).all())
+        total_present = int(sum(counts.values()))
+        total_hadir = int(counts.get("hadir", 0))
+        total_terlambat = int(counts.get("terlambat", 0))
         total_absent = total_students - total_present
         
         attendance_percentage = (total_present / total_students * 100) if total_students > 0 else 0.0
@@ -300,6 +542,116 @@ class AttendanceService:
             for absensi, user in results
         ]
     
+    def count_attendance(
+        self,
+        db: Session,
+        start_date: date,
+        end_date: Optional[date] = None,
+        kelas: Optional[str] = None
+    ) -> int:
+        """
+        Count attendance records in a date range from the daily summary.
+        
+        Args:
+            db: Database session
+            start_date: Start date
+            end_date: End date (optional)
+            kelas: Filter by class (optional)
+            
+        Returns:
+            Number of attendance records
+        """
+        query = db.query(func.sum(DailyAttendanceSummary.count)).filter(DailyAttendanceSummary.date >= start_date)
+        
+        if end_date:
+            query = query.filter(DailyAttendanceSummary.date <= end_date)
+        
+        if kelas:
+            query = query.filter(DailyAttendanceSummary.kelas == kelas)
+        
+        return int(query.scalar() or 0)
+    
+    def _add_to_summary(self, db: Session, counts: Dict[Tuple[date, Optional[str], str], int]) -> None:
+        """
+        Add attendance counts to the daily summary inside the caller's transaction.
+        
+        Args:
+            db: Database session
+            counts: {(date, kelas, status): number of new records}
+        """
+        # Upsert on the unique (date, kelas, status): concurrent first submissions
+        # of a group add to the same row instead of failing on the constraint
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        statement = dialect.insert(DailyAttendanceSummary)
+        statement = statement.on_conflict_do_update(
+            index_elements=["date", "kelas", "status"],
+            set_={"count": DailyAttendanceSummary.count + statement.excluded["count"]}
+        )
+        
+        db.execute(statement, [
+            {
+                "date": summary_date,
+                "kelas": NO_CLASS if kelas is None else kelas,
+                "status": status,
+                "count": count
+            }
+            for (summary_date, kelas, status), count in counts.items()
+        ])
+    
+    def rebuild_daily_summary(
+        self,
+        db: Session,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        dates: Optional[List[date]] = None
+    ) -> int:
+        """
+        Recompute the daily summary from the attendance records.
+        Runs inside the caller's transaction (call db.commit() afterwards).
+        Classes are taken from the students' current User.kelas.
+        
+        Args:
+            db: Database session
+            start_date: First date to rebuild (optional)
+            end_date: Last date to rebuild (optional)
+            dates: Rebuild only these dates (optional)
+            
+        Returns:
+            Number of summary rows written
+        """
+        def in_range(query, column):
+            if start_date:
+                query = query.filter(column >= start_date)
+            if end_date:
+                query = query.filter(column <= end_date)
+            if dates is not None:
+                query = query.filter(column.in_(dates))
+            return query
+        
+        in_range(db.query(DailyAttendanceSummary), DailyAttendanceSummary.date).delete(synchronize_session=False)
+        
+        grouped = in_range(
+            db.query(Absensi.date, User.kelas, Absensi.status, func.count(Absensi.id)).join(
+                User, User.id == Absensi.user_id
+            ),
+            Absensi.date
+        ).group_by(Absensi.date, User.kelas, Absensi.status).all()
+        
+        if not grouped:
+            return 0
+        
+        db.execute(insert(DailyAttendanceSummary), [
+            {
+                "date": summary_date,
+                "kelas": NO_CLASS if kelas is None else kelas,
+                "status": status,
+                "count": count
+            }
+            for summary_date, kelas, status, count in grouped
+        ])
+        
+        return len(grouped)
+    
     def _get_total_days(self, start_date: Optional[date], end_date: Optional[date]) -> int:
         """Calculate total days between dates (defaults to current month)."""
         if not start_date:
@@ -312,23 +664,26 @@ class AttendanceService:
     def _calculate_streak(self, db: Session, user_id: int) -> int:
         """Calculate current attendance streak."""
         today = date.today()
+        
+        # Attendance dates of the last 30 days (max streak checked), newest first
+        dates = db.query(Absensi.date).filter(
+            and_(
+                Absensi.user_id == user_id,
+                Absensi.date <= today,
+                Absensi.date > today - timedelta(days=self.STREAK_MAX_DAYS)
+            )
+        ).distinct().order_by(desc(Absensi.date)).all()
+        
+        return self._streak_from_dates([row.date for row in dates], today)
+    
+    def _streak_from_dates(self, dates: List[date], today: date) -> int:
+        """Count consecutive days back from today in dates (sorted newest first)."""
         streak = 0
-        current_date = today
         
-        # Check backwards from today
-        for _ in range(30):  # Max 30 days check
-            attendance = db.query(Absensi).filter(
-                and_(
-                    Absensi.user_id == user_id,
-                    Absensi.date == current_date
-                )
-            ).first()
-            
-            if attendance:
-                streak += 1
-                current_date -= timedelta(days=1)
-            else:
+        for attendance_date in dates:
+            if attendance_date != today - timedelta(days=streak):
                 break
+            streak += 1
         
         return streak
 
@@ -0,0 +1,185 @@
+"""
+Face Recognition Engines
+Common detect/encode/match interface over the available embedding models.
+
+Every engine produces fixed-size embeddings that are compared with
+Euclidean distance in the FaceGallery, and stores them under its own
+model tag in FaceEncoding, so encodings of different engines never mix
+and an engine can be switched (FACE_ENGINE) without re-registering
+everyone at once (see app.db.bulk_enroll).
+
+- dlib: face_recognition ResNet, 128D, distance threshold FACE_RECOGNITION_TOLERANCE
+- facenet: Keras FaceNet (Inception ResNet v1), 512D L2-normalized,
+  cosine similarity threshold FACENET_SIMILARITY_THRESHOLD
+"""
+
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
+import numpy as np
+import face_recognition
+
+from app.core.config import settings
+
+Box = Tuple[int, int, int, int]
+
+
+class FaceEngine(ABC):
+    """Base class of the recognition engines."""
+    
+    name: str = ""
+    dimension: int = 128
+    
+    def detect(self, img_array: np.ndarray) -> List[Box]:
+        """
+        Detect faces in an RGB image.
+        Shared HOG/CNN detector, engines only differ in how faces are encoded.
+        
+        Args:
+            img_array: RGB numpy array
+        
+        Returns:
+            List of face locations [(top, right, bottom, left), ...]
+        """
+        return face_recognition.face_locations(img_array, model=settings.FACE_DETECTION_MODEL)
+    
+    @abstractmethod
+    def encode(self, img_array: np.ndarray, boxes: List[Box]) -> List[np.ndarray]:
+        """
+        Encode the faces at the given locations.
+        
+        Args:
+            img_array: RGB numpy array
+            boxes: Face locations in img_array coordinates
+        
+        Returns:
+            One embedding (dimension,) per box
+        """
+    
+    @property
+    @abstractmethod
+    def tolerance(self) -> float:
+        """Maximum Euclidean distance between embeddings of the same person."""
+    
+    @abstractmethod
+    def distance_to_confidence(self, distance: float) -> float:
+        """
+        Convert an embedding distance to a user-friendly confidence score.
+        
+        Args:
+            distance: Euclidean distance between embeddings
+        
+        Returns:
+            Confidence between 0.0 and 1.0
+        """
+
+
+class DlibEngine(FaceEngine):
+    """face_recognition (dlib ResNet) 128D encodings."""
+    
+    name = "dlib"
+    dimension = 128
+    
+    def encode(self, img_array: np.ndarray, boxes: List[Box]) -> List[np.ndarray]:
+        return face_recognition.face_encodings(img_array, known_face_locations=boxes, model="large")
+    
+    @property
+    def tolerance(self) -> float:
+        return settings.FACE_RECOGNITION_TOLERANCE
+    
+    def distance_to_confidence(self, distance: float) -> float:
+        # In face_recognition library:
+        # - Distance 0.0 = exact match (100%)
+        # - Distance 0.4 = good match (~85%)
+        # - Distance 0.5 = acceptable (~75%)
+        # - Distance 0.6 = threshold (~65%)
+        # - Distance > 0.6 = not a match
+        
+        # Convert distance to confidence percentage for user-friendly display
+        # Using linear interpolation: distance 0 -> 100%, distance 0.6 -> 60%
+        # This provides a more intuitive confidence score for users
+        if distance <= 0.0:
+            return 1.0
+        elif distance >= 0.8:
+            return 0.4  # Minimum 40% for very poor matches
+        
+        # Linear scale: 100% at distance 0, 60% at distance 0.6
+        # Formula: confidence = 1.0 - (distance * 0.667)
+        # This maps: 0.0 -> 100%, 0.3 -> 80%, 0.45 -> 70%, 0.6 -> 60%
+        return max(0.4, 1.0 - (distance * 0.67))
+
+
+class FaceNetEngine(FaceEngine):
+    """Keras FaceNet 512D L2-normalized embeddings."""
+    
+    name = "facenet"
+    dimension = 512
+    
+    # Extra context around the detector box, FaceNet was trained on loose crops
+    CROP_MARGIN = 0.2
+    
+    def _crop(self, img_array: np.ndarray, box: Box) -> np.ndarray:
+        """Crop a face with margin and return it in BGR (FaceNetService input)."""
+        top, right, bottom, left = box
+        height, width = img_array.shape[:2]
+        margin_y = int((bottom - top) * self.CROP_MARGIN)
+        margin_x = int((right - left) * self.CROP_MARGIN)
+        
+        crop = img_array[
+            max(0, top - margin_y):min(height, bottom + margin_y),
+            max(0, left - margin_x):min(width, right + margin_x)
+        ]
+        
+        return np.ascontiguousarray(crop[:, :, ::-1])
+    
+    def encode(self, img_array: np.ndarray, boxes: List[Box]) -> List[np.ndarray]:
+        # Imported lazily: loading TensorFlow is only paid when the engine is used
+        from app.services.facenet_service import get_embedding_batcher, get_facenet_service
+        
+        crops = [self._crop(img_array, box) for box in boxes]
+        if not crops:
+            return []
+        
+        if settings.RECOGNITION_EXECUTOR == "thread" and settings.FACENET_BATCH_WAIT_MS > 0:
+            # Share forward passes with requests running in other threads.
+            # A process worker runs one job at a time, waiting would only add latency
+            batcher = get_embedding_batcher(
+                settings.FACENET_SIMILARITY_THRESHOLD,
+                settings.FACENET_MAX_BATCH,
+                settings.FACENET_BATCH_WAIT_MS
+            )
+            return batcher.embed(crops)
+        
+        service = get_facenet_service(settings.FACENET_SIMILARITY_THRESHOLD)
+        return list(service.extract_embeddings(crops))
+    
+    @property
+    def tolerance(self) -> float:
+        # Unit vectors: ||a - b||^2 = 2 - 2 cos(a, b)
+        return math.sqrt(2.0 * (1.0 - settings.FACENET_SIMILARITY_THRESHOLD))
+    
+    def distance_to_confidence(self, distance: float) -> float:
+        # Confidence is the cosine similarity, clamped to [0, 1]
+        return max(0.0, min(1.0, 1.0 - distance * distance / 2.0))
+
+
+ENGINES: Dict[str, type] = {
+    DlibEngine.name: DlibEngine,
+    FaceNetEngine.name: FaceNetEngine,
+}
+
+
+def get_engine(name: str) -> FaceEngine:
+    """
+    Create the engine registered under name.
+    
+    Args:
+        name: Engine name ("dlib" or "facenet")
+    
+    Returns:
+        FaceEngine instance
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown face engine: {name} (available: {', '.join(ENGINES)})")
+    
+    return ENGINES[name]()
@@ -0,0 +1,141 @@
+"""
+Face Folder Sync
+Keeps User.has_face in line with the image folders in FACE_STORAGE_PATH.
+
+A manifest of every folder's mtime and image count is persisted next to
+the folders, so a restart only lists the folders that changed since the
+last sync and looks their users up with batched IN queries.
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import User
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class FaceFolderSync:
+    """Incremental sync of face image folders to User.has_face."""
+    
+    MANIFEST_NAME = ".sync_manifest.json"
+    
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(settings.FACE_STORAGE_PATH, self.MANIFEST_NAME)
+    
+    def _load_manifest(self) -> Dict[str, List[int]]:
+        """Read {nim: [mtime_ns, image_count]} (empty if missing or unreadable)."""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save_manifest(self, manifest: Dict[str, List[int]]) -> None:
+        """Atomically write the manifest."""
+        tmp_path = f"{self.manifest_path}.tmp"
+        
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        
+        os.replace(tmp_path, self.manifest_path)
+    
+    def sync(self, db: Session) -> Dict:
+        """
+        Set has_face for users whose folder changed and holds enough images.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Dictionary with folder, changed and updated counts
+        """
+        root = settings.FACE_STORAGE_PATH
+        
+        if not os.path.isdir(root):
+            return {"folders": 0, "changed": 0, "updated": 0}
+        
+        previous = self._load_manifest()
+        manifest: Dict[str, List[int]] = {}
+        changed: List[str] = []
+        
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if not entry.is_dir() or entry.name.startswith((".", "_")):
+                    continue
+                
+                # Adding or removing files updates the folder's mtime
+                mtime = entry.stat().st_mtime_ns
+                known = previous.get(entry.name)
+                
+                if known and known[0] == mtime:
+                    manifest[entry.name] = known
+                    continue
+                
+                count = sum(1 for name in os.listdir(entry.path) if name.lower().endswith(IMAGE_EXTENSIONS))
+                manifest[entry.name] = [mtime, count]
+                changed.append(entry.name)
+        
+        eligible = [nim for nim in changed if manifest[nim][1] >= settings.MIN_FACE_IMAGES]
+        found = set()
+        updated = 0
+        
+        try:
+            for start in range(0, len(eligible), 500):
+                chunk = eligible[start:start + 500]
+                users = db.query(User.id, User.nim, User.has_face).filter(User.nim.in_(chunk)).all()
+                found.update(user.nim for user in users)
+                
+                to_update = [user.id for user in users if not user.has_face]
+                if to_update:
+                    updated += db.query(User).filter(User.id.in_(to_update)).update(
+                        {User.has_face: True},
+                        synchronize_session=False
+                    )
+            
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        # Folders without a user yet are re-checked on the next sync
+        for nim in eligible:
+            if nim not in found:
+                manifest.pop(nim, None)
+        
+        self._save_manifest(manifest)
+        
+        return {"folders": len(manifest), "changed": len(changed), "updated": updated}
+    
+    def run(self) -> None:
+        """Sync with a dedicated session and log the outcome."""
+        db = SessionLocal()
+        try:
+            result = self.sync(db)
+            print(f"✅ Face registration status synced: {result['changed']} of {result['folders']} folders "
+                  f"changed, {result['updated']} users updated")
+        except Exception as e:
+            print(f"⚠️ Error syncing face status: {e}")
+        finally:
+            db.close()
+    
+    def start_background(self) -> None:
+        """Run the sync in a daemon thread so startup does not wait for it."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        
+        self._thread = threading.Thread(target=self.run, name="face-folder-sync", daemon=True)
+        self._thread.start()
+
+
+# Global sync instance
+face_folder_sync = FaceFolderSync()
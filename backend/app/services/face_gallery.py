@@ -0,0 +1,250 @@
+"""
+Face Gallery
+In-memory matrix of registered face encodings for vectorized matching.
+
+All encodings are kept in one contiguous float32 (N x 128) matrix with a
+parallel user-id array sorted by user, so a scan is a single matrix-vector
+distance computation followed by a per-user min reduction.
+"""
+
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+
+class FaceGallery:
+    """Immutable gallery of face encodings grouped by user."""
+
+    def __init__(self, user_ids: np.ndarray, embeddings: np.ndarray):
+        """
+        Build gallery from parallel arrays.
+
+        Args:
+            user_ids: Array of user IDs, one per encoding (N,)
+            embeddings: Encoding matrix (N x D)
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+
+        if embeddings.ndim != 2:
+            embeddings = embeddings.reshape(len(user_ids), -1)
+
+        # Sort rows by user so every user owns one contiguous block
+        order = np.argsort(user_ids, kind="stable")
+        self.user_ids = user_ids[order]
+        self.embeddings = np.ascontiguousarray(embeddings[order])
+
+        # Squared norms are reused by every distance computation
+        self._sq_norms = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+
+        # Start offset of each user's block, for np.minimum.reduceat
+        self.unique_user_ids, self._starts = np.unique(self.user_ids, return_index=True)
+
+        # Optional approximate index (see app.services.face_index)
+        self.index = None
+
+    @classmethod
+    def empty(cls, dimension: int = 128) -> "FaceGallery":
+        """Create an empty gallery."""
+        return cls(np.empty(0, dtype=np.int64), np.empty((0, dimension), dtype=np.float32))
+
+    @classmethod
+    def from_encodings(
+        cls,
+        entries: Iterable[Tuple[int, np.ndarray]],
+        dimension: int = 128
+    ) -> "FaceGallery":
+        """
+        Build gallery from (user_id, encoding) pairs.
+
+        Args:
+            entries: Iterable of (user_id, encoding) tuples
+            dimension: Encoding dimension used when entries is empty
+
+        Returns:
+            FaceGallery instance
+        """
+        user_ids: List[int] = []
+        encodings: List[np.ndarray] = []
+
+        for user_id, encoding in entries:
+            user_ids.append(user_id)
+            encodings.append(encoding)
+
+        if not encodings:
+            return cls.empty(dimension)
+
+        return cls(np.array(user_ids, dtype=np.int64), np.stack(encodings))
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    @property
+    def user_count(self) -> int:
+        """Number of distinct users in the gallery."""
+        return len(self.unique_user_ids)
+
+    @property
+    def dimension(self) -> int:
+        """Encoding dimension."""
+        return self.embeddings.shape[1]
+
+    def _squared_distances(self, query: np.ndarray) -> np.ndarray:
+        """Squared Euclidean distance from query to every encoding."""
+        query = np.asarray(query, dtype=np.float32).ravel()
+
+        # ||e - q||^2 = ||e||^2 - 2 e.q + ||q||^2 (one matrix-vector product)
+        sq = self._sq_norms - 2.0 * (self.embeddings @ query) + float(query @ query)
+        np.maximum(sq, 0.0, out=sq)
+
+        return sq
+
+    def distances(self, query: np.ndarray) -> np.ndarray:
+        """
+        Euclidean distance from query to every encoding.
+
+        Args:
+            query: Face encoding (D,)
+
+        Returns:
+            Distance array (N,)
+        """
+        return np.sqrt(self._squared_distances(query))
+
+    def user_distances(self, query: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Minimum distance from query to each user's encodings.
+
+        Args:
+            query: Face encoding (D,)
+
+        Returns:
+            Tuple of (user_ids, min_distances), both (U,)
+        """
+        if len(self) == 0:
+            return self.unique_user_ids, np.empty(0, dtype=np.float32)
+
+        # Reduce on squared distances, sqrt only the U per-user minima
+        sq = self._squared_distances(query)
+        return self.unique_user_ids, np.sqrt(np.minimum.reduceat(sq, self._starts))
+
+    def best_match(self, query: np.ndarray, exact: bool = False) -> Optional[Tuple[int, float]]:
+        """
+        Find the closest user to the query encoding.
+        Uses the approximate index when one is attached, unless exact=True.
+
+        Args:
+            query: Face encoding (D,)
+            exact: Force brute-force search over the whole gallery
+
+        Returns:
+            Tuple of (user_id, distance) or None if gallery is empty
+        """
+        if self.index is not None and not exact:
+            return self._approximate_best_match(query)
+
+        user_ids, min_distances = self.user_distances(query)
+
+        if len(user_ids) == 0:
+            return None
+
+        best = int(np.argmin(min_distances))
+        return int(user_ids[best]), float(min_distances[best])
+
+    def _approximate_best_match(self, query: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Best match among the rows of the index's nearest clusters only."""
+        rows = self.index.candidates(query)
+
+        if len(rows) == 0:
+            return None
+
+        query = np.asarray(query, dtype=np.float32).ravel()
+        sq = self._sq_norms[rows] - 2.0 * (self.embeddings[rows] @ query) + float(query @ query)
+
+        # Nearest row belongs to the nearest user, no per-user reduction needed
+        best = int(np.argmin(sq))
+        return int(self.user_ids[rows[best]]), float(np.sqrt(max(sq[best], 0.0)))
+
+    def best_matches(self, queries: np.ndarray, exact: bool = False) -> List[Optional[Tuple[int, float]]]:
+        """
+        Find the closest user for each of several query encodings.
+        Exact search is a single matrix-matrix product for the whole batch.
+
+        Args:
+            queries: Face encodings (B x D)
+            exact: Force brute-force search over the whole gallery
+
+        Returns:
+            List of (user_id, distance) per query, None if gallery is empty
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dimension)
+
+        if len(self) == 0:
+            return [None] * len(queries)
+
+        if self.index is not None and not exact:
+            return [self._approximate_best_match(query) for query in queries]
+
+        # ||e - q||^2 for every (query, encoding) pair, (B x N)
+        sq = queries @ self.embeddings.T
+        sq *= -2.0
+        sq += self._sq_norms
+        sq += np.einsum("ij,ij->i", queries, queries)[:, None]
+        np.maximum(sq, 0.0, out=sq)
+
+        user_sq = np.minimum.reduceat(sq, self._starts, axis=1)
+        best = np.argmin(user_sq, axis=1)
+        best_sq = user_sq[np.arange(len(queries)), best]
+
+        return [
+            (int(self.unique_user_ids[b]), float(np.sqrt(d)))
+            for b, d in zip(best, best_sq)
+        ]
+
+    def with_user(self, user_id: int, encodings: List[np.ndarray]) -> "FaceGallery":
+        """
+        Return a new gallery with one user's encodings replaced.
+
+        Args:
+            user_id: User ID to insert or replace
+            encodings: New encodings for the user
+
+        Returns:
+            New FaceGallery instance
+        """
+        keep = self.user_ids != user_id
+        user_ids = self.user_ids[keep]
+        embeddings = self.embeddings[keep]
+
+        if encodings:
+            new_rows = np.stack(encodings).astype(np.float32).reshape(len(encodings), -1)
+            user_ids = np.concatenate([user_ids, np.full(len(new_rows), user_id, dtype=np.int64)])
+            embeddings = np.concatenate([embeddings, new_rows])
+
+        gallery = FaceGallery(user_ids, embeddings)
+
+        # Keep trained centroids and existing cluster labels, only the
+        # new rows are assigned (same stable sort as the constructor)
+        if self.index is not None:
+            labels = self.index.labels[keep]
+            if encodings:
+                labels = np.concatenate([labels, self.index.assign(new_rows)])
+            gallery.index = self.index.with_labels(labels[np.argsort(user_ids, kind="stable")])
+
+        return gallery
+
+    def subset(self, user_ids: Iterable[int]) -> "FaceGallery":
+        """
+        Return a new gallery restricted to the given users (without index).
+
+        Args:
+            user_ids: User IDs to keep
+
+        Returns:
+            New FaceGallery instance
+        """
+        mask = np.isin(self.user_ids, np.fromiter(user_ids, dtype=np.int64))
+        return FaceGallery(self.user_ids[mask], self.embeddings[mask])
+
+    def without_user(self, user_id: int) -> "FaceGallery":
+        """Return a new gallery without the given user's encodings."""
+        return self.with_user(user_id, [])
@@ -0,0 +1,351 @@
+"""
+Face Gallery Cache
+Process-wide cache of the face gallery with write-through invalidation.
+
+The gallery is built once at startup and patched in place whenever face
+encodings are registered or removed. A version counter stored in the
+database lets every uvicorn worker detect changes made by other workers
+and reload only when needed.
+
+Alongside the global gallery, one small shard per class (User.kelas) is
+kept so class-scoped kiosks only match against their own students.
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.face_encoding import FaceEncoding
+from app.models.user import User
+from app.models.face_gallery_state import FaceGalleryState
+from app.services.face_gallery import FaceGallery
+from app.services.face_index import IVFIndex, estimate_recall
+from app.services.face_recognition_service import face_service
+
+
+class FaceGalleryCache:
+    """Cached face gallery shared by all requests in this process."""
+    
+    STATE_ID = 1
+    
+    def __init__(self):
+        self._gallery: Optional[FaceGallery] = None
+        self._version: int = -1
+        self._user_kelas: Dict[int, Optional[str]] = {}
+        self._shards: Dict[str, FaceGallery] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def version(self) -> int:
+        """Version of the cached gallery (-1 if not loaded)."""
+        return self._version
+    
+    def _read_version(self, db: Session) -> int:
+        """Read current gallery version from database (0 if never bumped)."""
+        version = db.query(FaceGalleryState.version).filter(
+            FaceGalleryState.id == self.STATE_ID
+        ).scalar()
+        
+        return version or 0
+    
+    def load(self, db: Session) -> FaceGallery:
+        """
+        Rebuild the gallery from all face encodings in the database.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Freshly loaded FaceGallery
+        """
+        with self._lock:
+            version = self._read_version(db)
+            rows = db.query(
+                FaceEncoding.user_id,
+                FaceEncoding.encoding_data,
+                User.kelas
+            ).join(User, User.id == FaceEncoding.user_id).filter(
+                FaceEncoding.model == face_service.engine.name
+            ).all()
+            
+            gallery = self._attach_index(face_service.build_gallery(rows), self._gallery)
+            user_kelas = {row.user_id: row.kelas for row in rows}
+            
+            self._gallery = gallery
+            self._user_kelas = user_kelas
+            self._shards = self._build_shards(gallery, user_kelas)
+            self._version = version
+            
+            print(f"✅ Face gallery loaded: {len(gallery)} encodings, {gallery.user_count} users, "
+                  f"{len(self._shards)} class shards (version {version}, {face_service.engine.name} engine, "
+                  f"{self.search_mode} search)")
+            
+            return self._gallery
+    
+    def _build_shards(
+        self,
+        gallery: FaceGallery,
+        user_kelas: Dict[int, Optional[str]],
+        only: Optional[List[str]] = None
+    ) -> Dict[str, FaceGallery]:
+        """
+        Build per-class galleries.
+        
+        Args:
+            gallery: Global gallery
+            user_kelas: {user_id: kelas}
+            only: Rebuild only these classes (default: all)
+            
+        Returns:
+            {kelas: FaceGallery}
+        """
+        members: Dict[str, List[int]] = {}
+        for user_id, kelas in user_kelas.items():
+            if kelas and (only is None or kelas in only):
+                members.setdefault(kelas, []).append(user_id)
+        
+        return {kelas: gallery.subset(user_ids) for kelas, user_ids in members.items()}
+    
+    @property
+    def search_mode(self) -> str:
+        """Search mode actually in use ("exact" or "ivf")."""
+        if self._gallery is not None and self._gallery.index is not None:
+            return "ivf"
+        return "exact"
+    
+    def _attach_index(self, gallery: FaceGallery, previous: Optional[FaceGallery] = None) -> FaceGallery:
+        """
+        Attach an IVF index to the gallery if approximate search is enabled.
+        Centroids of the previous gallery are reused when available, so a
+        reload triggered by another worker does not retrain k-means.
+        """
+        if settings.FACE_SEARCH_MODE != "ivf" or len(gallery) < settings.FACE_IVF_MIN_GALLERY_SIZE:
+            return gallery
+        
+        if previous is not None and previous.index is not None and previous.dimension == gallery.dimension:
+            gallery.index = previous.index.with_labels(previous.index.assign(gallery.embeddings))
+            return gallery
+        
+        gallery.index = IVFIndex.train(
+            gallery.embeddings,
+            nlist=settings.FACE_IVF_NLIST,
+            nprobe=settings.FACE_IVF_NPROBE
+        )
+        recall = estimate_recall(gallery, samples=100)
+        print(f"   📈 IVF index: nlist={gallery.index.nlist}, nprobe={gallery.index.nprobe}, "
+              f"estimated recall@1={recall:.2%}")
+        
+        return gallery
+    
+    def stats(self, recall_samples: int = 0) -> Dict:
+        """
+        Describe the cached gallery.
+        
+        Args:
+            recall_samples: If > 0, estimate approximate-search recall with this many queries
+            
+        Returns:
+            Dictionary with gallery size, search mode and index parameters
+        """
+        gallery = self._gallery
+        
+        result = {
+            "loaded": gallery is not None,
+            "version": self._version,
+            "encodings": len(gallery) if gallery is not None else 0,
+            "users": gallery.user_count if gallery is not None else 0,
+            "class_shards": {kelas: shard.user_count for kelas, shard in self._shards.items()},
+            "engine": face_service.engine.name,
+            "dimension": face_service.engine.dimension,
+            "configured_mode": settings.FACE_SEARCH_MODE,
+            "search_mode": self.search_mode,
+            "nlist": None,
+            "nprobe": None,
+            "recall_at_1": None
+        }
+        
+        if gallery is not None and gallery.index is not None:
+            result["nlist"] = gallery.index.nlist
+            result["nprobe"] = gallery.index.nprobe
+            if recall_samples > 0:
+                result["recall_at_1"] = round(estimate_recall(gallery, samples=recall_samples), 4)
+        
+        return result
+    
+    def get(self, db: Session) -> FaceGallery:
+        """
+        Get the cached gallery, reloading if another worker changed it.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Current FaceGallery
+        """
+        if self._gallery is None or self._read_version(db) != self._version:
+            return self.load(db)
+        
+        return self._gallery
+    
+    def get_scoped(self, db: Session, kelas: List[str]) -> FaceGallery:
+        """
+        Get a gallery restricted to students of the given classes.
+        
+        Args:
+            db: Database session
+            kelas: List of class names
+            
+        Returns:
+            Class shard (or merged shards) of the cached gallery
+        """
+        self.get(db)
+        shards = [self._shards[k] for k in dict.fromkeys(kelas) if k in self._shards]
+        
+        if not shards:
+            return FaceGallery.empty(self._gallery.dimension)
+        if len(shards) == 1:
+            return shards[0]
+        
+        return FaceGallery(
+            np.concatenate([shard.user_ids for shard in shards]),
+            np.concatenate([shard.embeddings for shard in shards])
+        )
+    
+    def match_batch(
+        self,
+        db: Session,
+        encodings: List[np.ndarray],
+        kelas: Optional[List[str]] = None
+    ) -> List[Tuple[Optional[int], float]]:
+        """
+        Match several face encodings, against the class shard first if kelas
+        is given and against all registered faces for the unmatched ones.
+        
+        Args:
+            db: Database session
+            encodings: Face encodings to match
+            kelas: Classes to match against first (optional)
+            
+        Returns:
+            List of (user_id or None if no match, confidence), one per encoding
+        """
+        gallery = self.get(db)
+        matches = [(None, 0.0)] * len(encodings)
+        
+        if not encodings or len(gallery) == 0:
+            return matches
+        
+        if kelas:
+            matches = face_service.match_gallery_batch(self.get_scoped(db, kelas), encodings)
+        
+        pending = [i for i, (user_id, _) in enumerate(matches) if user_id is None]
+        if pending:
+            fallback = face_service.match_gallery_batch(gallery, [encodings[i] for i in pending])
+            for i, match in zip(pending, fallback):
+                matches[i] = match
+        
+        return matches
+    
+    def bump_version(self, db: Session) -> int:
+        """
+        Increment the gallery version inside the caller's transaction.
+        Call before db.commit() of any change to face encodings.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            New gallery version
+        """
+        # Single upsert, so two workers bumping a fresh database cannot both insert the row
+        dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+        statement = dialect.insert(FaceGalleryState).values(id=self.STATE_ID, version=1)
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"version": FaceGalleryState.version + 1}
+        ))
+        
+        return self._read_version(db)
+    
+    def update_user(
+        self,
+        user_id: int,
+        encodings: List[np.ndarray],
+        version: int,
+        kelas: Optional[str] = None
+    ) -> None:
+        """
+        Patch one user's encodings after a committed registration.
+        
+        Args:
+            user_id: User ID
+            encodings: User's new encodings (empty list removes the user)
+            version: Gallery version returned by bump_version
+            kelas: User's class, used for the class shards
+        """
+        with self._lock:
+            # Only patch if no other worker changed the gallery in between,
+            # otherwise leave it stale so the next get() reloads it
+            if self._gallery is None or version != self._version + 1:
+                self._version = -1
+                return
+            
+            gallery = self._gallery.with_user(user_id, encodings)
+            
+            # Train the index once the gallery grows past the IVF threshold
+            if gallery.index is None:
+                gallery = self._attach_index(gallery)
+            
+            self._gallery = gallery
+            self._set_user_kelas(user_id, kelas if encodings else None)
+            self._version = version
+    
+    def remove_user(self, user_id: int, version: int) -> None:
+        """
+        Drop one user's encodings after a committed unregistration.
+        
+        Args:
+            user_id: User ID
+            version: Gallery version returned by bump_version
+        """
+        self.update_user(user_id, [], version)
+    
+    def move_user(self, user_id: int, kelas: Optional[str], version: int) -> None:
+        """
+        Move a user to another class shard after a committed class change.
+        
+        Args:
+            user_id: User ID
+            kelas: New class
+            version: Gallery version returned by bump_version
+        """
+        with self._lock:
+            if self._gallery is None or version != self._version + 1:
+                self._version = -1
+                return
+            
+            if user_id in self._user_kelas:
+                self._set_user_kelas(user_id, kelas)
+            self._version = version
+    
+    def _set_user_kelas(self, user_id: int, kelas: Optional[str]) -> None:
+        """Record a user's class and rebuild the affected class shards (lock held)."""
+        user_kelas = dict(self._user_kelas)
+        old_kelas = user_kelas.pop(user_id, None)
+        
+        if kelas is not None or user_id in self._gallery.unique_user_ids:
+            user_kelas[user_id] = kelas
+        
+        affected = [k for k in (old_kelas, kelas) if k]
+        shards = {k: v for k, v in self._shards.items() if k not in affected}
+        shards.update(self._build_shards(self._gallery, user_kelas, only=affected))
+        
+        self._user_kelas = user_kelas
+        self._shards = shards
+
+
+# Global cache instance
+face_gallery_cache = FaceGalleryCache()
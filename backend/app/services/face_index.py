@@ -0,0 +1,180 @@
+"""
+Face Index
+Approximate nearest-neighbour search for large face galleries.
+
+IVF (inverted file) index: gallery encodings are clustered with k-means
+into `nlist` coarse centroids and a query only scans the rows of its
+`nprobe` nearest clusters instead of the whole gallery.
+"""
+
+import math
+from typing import Optional
+import numpy as np
+
+
+def _nearest_centroids(x: np.ndarray, centroids: np.ndarray, centroid_sq: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for each row of x (N x D)."""
+    labels = np.empty(len(x), dtype=np.int64)
+    
+    # ||x||^2 is constant per row, so argmin of ||c||^2 - 2 x.c is enough.
+    # Work in chunks to bound the (chunk x K) temporary.
+    for start in range(0, len(x), 8192):
+        scores = x[start:start + 8192] @ centroids.T
+        scores *= -2.0
+        scores += centroid_sq
+        labels[start:start + 8192] = np.argmin(scores, axis=1)
+    
+    return labels
+
+
+class IVFIndex:
+    """Inverted file index over a gallery embedding matrix."""
+    
+    def __init__(self, centroids: np.ndarray, labels: np.ndarray, nprobe: int = 8):
+        """
+        Build inverted lists from cluster labels.
+        
+        Args:
+            centroids: Coarse centroids (K x D)
+            labels: Cluster of each gallery row (N,), in gallery row order
+            nprobe: Number of nearest clusters scanned per query
+        """
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self._centroid_sq = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.nprobe = max(1, min(nprobe, len(self.centroids)))
+        
+        # Group row indices by cluster: rows of cluster k are
+        # self._rows[self._offsets[k]:self._offsets[k + 1]]
+        self._rows = np.argsort(self.labels, kind="stable")
+        self._offsets = np.searchsorted(self.labels[self._rows], np.arange(len(self.centroids) + 1))
+    
+    @property
+    def nlist(self) -> int:
+        """Number of coarse clusters."""
+        return len(self.centroids)
+    
+    @classmethod
+    def train(
+        cls,
+        embeddings: np.ndarray,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        iterations: int = 10,
+        seed: int = 0
+    ) -> "IVFIndex":
+        """
+        Train centroids with k-means and build the index.
+        
+        Args:
+            embeddings: Gallery embedding matrix (N x D)
+            nlist: Number of clusters (default: about 4 * sqrt(N))
+            nprobe: Number of nearest clusters scanned per query
+            iterations: Lloyd iterations
+            seed: Random seed for reproducible centroids
+        
+        Returns:
+            Trained IVFIndex
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        n = len(embeddings)
+        
+        if not nlist:
+            nlist = int(4 * math.sqrt(n))
+        nlist = max(1, min(nlist, n))
+        
+        rng = np.random.default_rng(seed)
+        
+        # Train on a sample; 64 points per centroid is plenty for k-means
+        sample_size = min(n, nlist * 64)
+        sample = embeddings[rng.choice(n, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        
+        for _ in range(iterations):
+            centroid_sq = np.einsum("ij,ij->i", centroids, centroids)
+            labels = _nearest_centroids(sample, centroids, centroid_sq)
+            
+            # Per-cluster sums via sort + reduceat (much faster than np.add.at)
+            order = np.argsort(labels, kind="stable")
+            sorted_labels = labels[order]
+            starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+            filled = sorted_labels[starts]
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            counts = np.diff(np.r_[starts, len(sorted_labels)])
+            
+            # Empty clusters keep their previous centroid
+            centroids[filled] = sums / counts[:, None]
+        
+        index = cls(centroids, np.empty(0, dtype=np.int64), nprobe)
+        return index.with_labels(index.assign(embeddings))
+    
+    def assign(self, embeddings: np.ndarray) -> np.ndarray:
+        """Nearest centroid index for each row of embeddings."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        return _nearest_centroids(embeddings, self.centroids, self._centroid_sq)
+    
+    def with_labels(self, labels: np.ndarray) -> "IVFIndex":
+        """
+        Rebuild inverted lists for a changed gallery, keeping trained centroids.
+        
+        Args:
+            labels: Cluster of each row of the new gallery (N,)
+            
+        Returns:
+            New IVFIndex sharing this index's centroids
+        """
+        return IVFIndex(self.centroids, labels, self.nprobe)
+    
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """
+        Gallery row indices in the clusters nearest to the query.
+        
+        Args:
+            query: Face encoding (D,)
+            nprobe: Override number of clusters to scan
+        
+        Returns:
+            Array of row indices into the gallery matrix
+        """
+        nprobe = max(1, min(nprobe or self.nprobe, self.nlist))
+        query = np.asarray(query, dtype=np.float32).ravel()
+        
+        sq = self._centroid_sq - 2.0 * (self.centroids @ query)
+        probes = np.argpartition(sq, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        
+        return np.concatenate([
+            self._rows[self._offsets[k]:self._offsets[k + 1]] for k in probes
+        ])
+
+
+def estimate_recall(gallery, samples: int = 200, noise: float = 0.05, seed: int = 0) -> float:
+    """
+    Estimate recall@1 of the gallery's approximate search against exact search.
+    
+    Queries are gallery encodings perturbed with gaussian noise, which mimics
+    a new photo of an already registered face.
+    
+    Args:
+        gallery: FaceGallery with an attached index
+        samples: Number of queries
+        noise: Standard deviation of per-dimension noise
+        seed: Random seed
+    
+    Returns:
+        Fraction of queries where approximate and exact best user agree
+    """
+    if len(gallery) == 0:
+        return 1.0
+    
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(gallery), min(samples, len(gallery)), replace=False)
+    queries = gallery.embeddings[rows] + rng.normal(0.0, noise, (len(rows), gallery.dimension)).astype(np.float32)
+    
+    hits = 0
+    for query in queries:
+        exact = gallery.best_match(query, exact=True)
+        approx = gallery.best_match(query)
+        if approx is not None and approx[0] == exact[0]:
+            hits += 1
+    
+    return hits / len(queries)
@@ -1,28 +1,41 @@
 """
 Face Recognition Service
-Handles face detection, encoding, and recognition using face_recognition library.
+Handles face detection, encoding, and recognition with the configured
+engine (FACE_ENGINE, see app.services.face_engines).
 """
 
 import os
-import pickle
 import numpy as np
-import face_recognition
 from typing import List, Tuple, Optional, Dict
 from PIL import Image
 from datetime import datetime
 
 from app.core.config import settings
-from app.core.exceptions import BadRequestException, FaceNotRecognizedException
-from app.utils.image_processing import decode_base64_image, image_to_numpy, resize_image, validate_image_quality
-from app.utils.helpers import ensure_directory_exists, generate_filename
+from app.core.exceptions import BadRequestException
+from app.utils.image_processing import (
+    box_iou,
+    downscale_image,
+    image_to_numpy,
+    load_image,
+    validate_image_quality
+)
+from app.utils.helpers import ensure_directory_exists
+from app.utils.embedding_codec import (
+    encode_embedding,
+    decode_embedding,
+    is_binary_embedding
+)
+from app.services.face_gallery import FaceGallery
+from app.services.face_engines import get_engine
 
 
 class FaceRecognitionService:
     """Service for face detection, encoding, and recognition."""
     
     def __init__(self):
+        self.engine = get_engine(settings.FACE_ENGINE)  # dlib or facenet
         self.model = settings.FACE_DETECTION_MODEL  # "hog" or "cnn"
-        self.tolerance = settings.FACE_RECOGNITION_TOLERANCE  # 0.6 default
+        self.tolerance = self.engine.tolerance  # max embedding distance of a match
         self.min_confidence = settings.FACE_MIN_CONFIDENCE  # 0.8 default
     
     def detect_faces(self, image: Image.Image) -> List[Tuple[int, int, int, int]]:
@@ -35,13 +48,48 @@ class FaceRecognitionService:
         Returns:
             List of face locations [(top, right, bottom, left), ...]
         """
-        # Convert to numpy array
-        img_array = image_to_numpy(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
         
-        # Detect faces
-        face_locations = face_recognition.face_locations(img_array, model=self.model)
+        return self._locate_faces(image, image_to_numpy(image))
+    
+    def _locate_faces(
+        self,
+        image: Image.Image,
+        img_array: np.ndarray
+    ) -> List[Tuple[int, int, int, int]]:
+        """
+        Detect faces on a downscaled copy and scale the boxes back up.
         
-        return face_locations
+        Args:
+            image: PIL Image object (same pixels as img_array)
+            img_array: RGB numpy array of image
+            
+        Returns:
+            Face locations in img_array coordinates [(top, right, bottom, left), ...]
+        """
+        factor = max(1, int(round(1.0 / settings.FACE_DETECTION_SCALE)))
+        
+        # Never shrink below ~320px wide, small faces would be missed
+        while factor > 1 and image.width // factor < 320:
+            factor -= 1
+        
+        if factor == 1:
+            return self.engine.detect(img_array)
+        
+        # Image.reduce is a fast box filter; HOG cost drops ~factor^2
+        small = image_to_numpy(image.reduce(factor))
+        height, width = img_array.shape[:2]
+        
+        return [
+            (
+                max(0, top * factor),
+                min(width, right * factor),
+                min(height, bottom * factor),
+                max(0, left * factor)
+            )
+            for top, right, bottom, left in self.engine.detect(small)
+        ]
     
     def encode_face(self, image: Image.Image) -> Optional[np.ndarray]:
         """
@@ -51,28 +99,219 @@ class FaceRecognitionService:
             image: PIL Image object
             
         Returns:
-            Face encoding as numpy array (128D) or None if no face detected
+            Face encoding as numpy array or None if no face detected
         """
-        # Validate image quality
-        is_valid, error_msg = validate_image_quality(image)
+        result = self.encode_face_with_location(image)
+        
+        if result is None:
+            return None
+        
+        return result[0]
+    
+    def encode_face_with_location(
+        self,
+        image: Image.Image
+    ) -> Optional[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+        """
+        Generate face encoding for the largest face, detecting only once.
+        
+        Args:
+            image: PIL Image object
+            
+        Returns:
+            Tuple of (encoding, (top, right, bottom, left) box in original
+            image coordinates) or None if no face detected
+        """
+        original_size = image.size
+        
+        # Decode straight to working resolution (JPEG draft mode) in RGB
+        image = downscale_image(image, (1280, 720))
+        
+        # Validate image quality (brightness on a small thumbnail)
+        is_valid, error_msg = validate_image_quality(image, original_size=original_size)
         if not is_valid:
             raise BadRequestException(error_msg)
         
-        # Resize if too large
-        if image.width > 1280 or image.height > 720:
-            image = resize_image(image, (1280, 720))
+        # Convert to numpy once
+        img_array = image_to_numpy(image)
+        
+        # Detect once (downscaled), then encode at the known location
+        face_locations = self._locate_faces(image, img_array)
+        
+        if len(face_locations) == 0:
+            return None
+        
+        box = max(face_locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+        encodings = self.engine.encode(img_array, [box])
+        
+        if len(encodings) == 0:
+            return None
+        
+        # Report the box in the coordinates of the uploaded image
+        ratio = original_size[0] / image.width
+        original_box = tuple(int(round(v * ratio)) for v in box)
+        
+        return encodings[0], original_box
+    
+    def track_face(
+        self,
+        image: Image.Image,
+        track_box: Optional[Tuple[int, int, int, int]] = None,
+        refresh: bool = True
+    ) -> Optional[Tuple[Tuple[int, int, int, int], Optional[np.ndarray]]]:
+        """
+        Detect the largest face and encode it only if it is not a known track.
+        Detection is cheap compared to the encoding, so a face that
+        overlaps the previous frame's box keeps the track's identity.
+        
+        Args:
+            image: PIL Image object
+            track_box: Box of the tracked face in the previous frame (original coordinates)
+            refresh: Encode even if the face continues the track
+            
+        Returns:
+            Tuple of (box in original coordinates, encoding or None if the
+            track was continued without encoding), or None if no face detected
+        """
+        original_size = image.size
+        image = downscale_image(image, (1280, 720))
+        
+        is_valid, error_msg = validate_image_quality(image, original_size=original_size)
+        if not is_valid:
+            raise BadRequestException(error_msg)
         
-        # Convert to numpy
         img_array = image_to_numpy(image)
+        face_locations = self._locate_faces(image, img_array)
+        
+        if len(face_locations) == 0:
+            return None
+        
+        box = max(face_locations, key=lambda loc: (loc[2] - loc[0]) * (loc[1] - loc[3]))
+        ratio = original_size[0] / image.width
+        original_box = tuple(int(round(v * ratio)) for v in box)
         
-        # Get face encodings
-        encodings = face_recognition.face_encodings(img_array, model="large")
+        if not refresh and track_box is not None and box_iou(original_box, track_box) >= settings.FACE_TRACK_MIN_IOU:
+            return original_box, None
+        
+        encodings = self.engine.encode(img_array, [box])
         
         if len(encodings) == 0:
             return None
         
-        # Return first face encoding
-        return encodings[0]
+        return original_box, encodings[0]
+    
+    def track_image_data(
+        self,
+        image_data: bytes,
+        track_box: Optional[Tuple[int, int, int, int]] = None,
+        refresh: bool = True
+    ) -> Optional[Tuple[Tuple[int, int, int, int], Optional[np.ndarray]]]:
+        """
+        Decode raw image bytes and run track_face (worker entry point).
+        
+        Args:
+            image_data: Raw image file bytes
+            track_box: Box of the tracked face in the previous frame
+            refresh: Encode even if the face continues the track
+            
+        Returns:
+            Same as track_face
+        """
+        return self.track_face(load_image(image_data), track_box, refresh)
+    
+    def encode_all_faces(
+        self,
+        image: Image.Image,
+        max_size: Tuple[int, int] = (1920, 1080)
+    ) -> List[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+        """
+        Detect and encode every face in the image in a single pass.
+        Meant for wide classroom photos, so detection runs at the working
+        resolution (no extra downscale) to keep small faces detectable.
+        
+        Args:
+            image: PIL Image object
+            max_size: Working resolution bound (width, height)
+            
+        Returns:
+            List of (encoding, (top, right, bottom, left) box in original
+            image coordinates), one per detected face
+        """
+        original_size = image.size
+        image = downscale_image(image, max_size)
+        
+        is_valid, error_msg = validate_image_quality(image, original_size=original_size)
+        if not is_valid:
+            raise BadRequestException(error_msg)
+        
+        img_array = image_to_numpy(image)
+        
+        face_locations = self.engine.detect(img_array)
+        
+        if len(face_locations) == 0:
+            return []
+        
+        # One call computes landmarks and encodings for all faces
+        encodings = self.engine.encode(img_array, face_locations)
+        
+        ratio = original_size[0] / image.width
+        return [
+            (encoding, tuple(int(round(v * ratio)) for v in box))
+            for encoding, box in zip(encodings, face_locations)
+        ]
+    
+    def encode_image_data(
+        self,
+        image_data: bytes
+    ) -> Optional[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+        """
+        Decode raw image bytes and encode the largest face.
+        Entry point for recognition workers: only bytes cross the process
+        boundary, decoding happens in the worker.
+        
+        Args:
+            image_data: Raw image file bytes
+            
+        Returns:
+            Same as encode_face_with_location
+        """
+        return self.encode_face_with_location(load_image(image_data))
+    
+    def encode_all_image_data(
+        self,
+        image_data: bytes
+    ) -> List[Tuple[np.ndarray, Tuple[int, int, int, int]]]:
+        """
+        Decode raw image bytes and encode every face (worker entry point).
+        
+        Args:
+            image_data: Raw image file bytes
+            
+        Returns:
+            Same as encode_all_faces
+        """
+        return self.encode_all_faces(load_image(image_data))
+    
+    def encode_images_data(self, images_data: List[bytes]) -> List:
+        """
+        Encode several raw images in one worker job.
+        
+        Args:
+            images_data: List of raw image file bytes
+            
+        Returns:
+            One entry per image: the encode_image_data result, or the
+            exception raised for that image (e.g. BadRequestException)
+        """
+        results = []
+        
+        for image_data in images_data:
+            try:
+                results.append(self.encode_image_data(image_data))
+            except Exception as e:
+                results.append(e)
+        
+        return results
     
     def encode_multiple_faces(self, images: List[Image.Image]) -> List[np.ndarray]:
         """
@@ -111,32 +350,17 @@ class FaceRecognitionService:
         if len(known_encodings) == 0:
             return False, 0.0
         
-        # Compare faces using face_recognition library
-        face_distances = face_recognition.face_distance(known_encodings, face_encoding)
+        # Euclidean distance to every known encoding
+        face_distances = np.linalg.norm(
+            np.asarray(known_encodings, dtype=np.float32) - np.asarray(face_encoding, dtype=np.float32),
+            axis=1
+        )
         
         # Get best match (minimum distance)
         best_match_index = np.argmin(face_distances)
         best_distance = float(face_distances[best_match_index])
         
-        # In face_recognition library:
-        # - Distance 0.0 = exact match (100%)
-        # - Distance 0.4 = good match (~85%)
-        # - Distance 0.5 = acceptable (~75%)
-        # - Distance 0.6 = threshold (~65%)
-        # - Distance > 0.6 = not a match
-        
-        # Convert distance to confidence percentage for user-friendly display
-        # Using linear interpolation: distance 0 -> 100%, distance 0.6 -> 60%
-        # This provides a more intuitive confidence score for users
-        if best_distance <= 0.0:
-            confidence = 1.0
-        elif best_distance >= 0.8:
-            confidence = 0.4  # Minimum 40% for very poor matches
-        else:
-            # Linear scale: 100% at distance 0, 60% at distance 0.6
-            # Formula: confidence = 1.0 - (distance * 0.667)
-            # This maps: 0.0 -> 100%, 0.3 -> 80%, 0.45 -> 70%, 0.6 -> 60%
-            confidence = max(0.4, 1.0 - (best_distance * 0.67))
+        confidence = self.distance_to_confidence(best_distance)
         
         # Match if distance is within tolerance
         is_match = best_distance <= self.tolerance
@@ -145,6 +369,97 @@ class FaceRecognitionService:
         
         return is_match, confidence
     
+    def distance_to_confidence(self, distance: float) -> float:
+        """
+        Convert face distance to a user-friendly confidence score.
+        
+        Args:
+            distance: Euclidean distance between encodings
+            
+        Returns:
+            Confidence between 0.0 and 1.0 (scale depends on the engine)
+        """
+        return self.engine.distance_to_confidence(distance)
+    
+    def build_gallery(self, face_encodings: List) -> FaceGallery:
+        """
+        Build an in-memory gallery from FaceEncoding rows.
+        
+        Args:
+            face_encodings: List of FaceEncoding model instances
+            
+        Returns:
+            FaceGallery with one row per valid encoding
+        """
+        entries = []
+        
+        for fe in face_encodings:
+            try:
+                entries.append((fe.user_id, self.deserialize_encoding(fe.encoding_data)))
+            except Exception as e:
+                print(f"⚠️ Failed to deserialize encoding for user {fe.user_id}: {e}")
+                continue
+        
+        return FaceGallery.from_encodings(entries, self.engine.dimension)
+    
+    def match_gallery(
+        self,
+        gallery: FaceGallery,
+        face_encoding: np.ndarray
+    ) -> Tuple[Optional[int], float]:
+        """
+        Match a face encoding against every user in the gallery at once.
+        
+        Args:
+            gallery: FaceGallery of registered encodings
+            face_encoding: Face encoding to match
+            
+        Returns:
+            Tuple of (user_id or None if no match, confidence)
+        """
+        best = gallery.best_match(face_encoding)
+        
+        if best is None:
+            return None, 0.0
+        
+        user_id, distance = best
+        confidence = self.distance_to_confidence(distance)
+        is_match = distance <= self.tolerance
+        
+        print(f"   📊 Best user {user_id}: distance={distance:.4f}, confidence={confidence:.2%}, match={is_match}")
+        
+        return (user_id if is_match else None), confidence
+    
+    def match_gallery_batch(
+        self,
+        gallery: FaceGallery,
+        face_encodings: List[np.ndarray]
+    ) -> List[Tuple[Optional[int], float]]:
+        """
+        Match several face encodings against the gallery in one pass.
+        
+        Args:
+            gallery: FaceGallery of registered encodings
+            face_encodings: Face encodings to match
+            
+        Returns:
+            List of (user_id or None if no match, confidence), one per encoding
+        """
+        if not face_encodings:
+            return []
+        
+        results = []
+        for best in gallery.best_matches(np.stack(face_encodings)):
+            if best is None:
+                results.append((None, 0.0))
+                continue
+            
+            user_id, distance = best
+            is_match = distance <= self.tolerance
+            results.append((user_id if is_match else None, self.distance_to_confidence(distance)))
+        
+        return results
+    
     def recognize_face(
         self,
         image: Image.Image,
@@ -168,23 +483,8 @@ class FaceRecognitionService:
         if face_encoding is None:
             raise BadRequestException("No face detected in image")
         
-        # Group encodings by user
-        user_encoding_map = {}
-        for user_id, encoding in zip(user_ids, known_encodings):
-            if user_id not in user_encoding_map:
-                user_encoding_map[user_id] = []
-            user_encoding_map[user_id].append(encoding)
-        
-        # Find best match across all users
-        best_user_id = None
-        best_confidence = 0.0
-        
-        for user_id, encodings in user_encoding_map.items():
-            is_match, confidence = self.compare_faces(encodings, face_encoding)
-            
-            if is_match and confidence > best_confidence:
-                best_user_id = user_id
-                best_confidence = confidence
+        gallery = FaceGallery.from_encodings(zip(user_ids, known_encodings), self.engine.dimension)
+        best_user_id, best_confidence = self.match_gallery(gallery, face_encoding)
         
         if best_user_id is None:
             return None
@@ -211,21 +511,78 @@ class FaceRecognitionService:
         Returns:
             Relative path to saved image
         """
-        # Create user directory
-        user_dir = os.path.join(settings.FACE_STORAGE_PATH, user_nim)
-        ensure_directory_exists(user_dir)
+        image_path = self.face_image_path(user_nim, index)
+        self.write_face_image(image, image_path)
         
-        # Generate filename
+        return image_path
+    
+    def face_image_path(self, user_nim: str, index: int = 0) -> str:
+        """
+        Generate the relative storage path for a face image without writing it.
+        
+        Args:
+            user_nim: User's NIM
+            index: Image index
+            
+        Returns:
+            Relative path (user_nim/filename.jpg)
+        """
         filename = f"{user_nim}_{index}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-        filepath = os.path.join(user_dir, filename)
+        return os.path.join(user_nim, filename)
+    
+    def write_face_image(self, image: Image.Image, image_path: str) -> None:
+        """
+        Write face image to a path produced by face_image_path.
         
-        # Save image
-        if image.mode != "RGB":
-            image = image.convert("RGB")
+        Args:
+            image: PIL Image object
+            image_path: Relative path under FACE_STORAGE_PATH
+        """
+        filepath = os.path.join(settings.FACE_STORAGE_PATH, image_path)
+        ensure_directory_exists(os.path.dirname(filepath))
+        
+        # Save image (same 1280x720 bound used for encoding)
+        image = downscale_image(image, (1280, 720))
         image.save(filepath, "JPEG", quality=90, optimize=True)
+    
+    def replace_user_images(self, user_nim: str, images: List[Tuple[bytes, str]]) -> None:
+        """
+        Replace all face images of a user.
+        Runs as a background task after a registration has been committed.
         
-        # Return relative path
-        return os.path.join(user_nim, filename)
+        Args:
+            user_nim: User's NIM
+            images: List of (raw image bytes, relative path from face_image_path)
+        """
+        self.delete_user_images(user_nim)
+        
+        for image_data, image_path in images:
+            try:
+                self.write_face_image(load_image(image_data), image_path)
+            except Exception as e:
+                print(f"⚠️ Failed to save face image {image_path}: {e}")
+    
+    def save_snapshot_image(self, image: Image.Image) -> str:
+        """
+        Save a classroom snapshot to storage.
+        
+        Args:
+            image: PIL Image object
+            
+        Returns:
+            Relative path to saved image
+        """
+        snapshot_dir = os.path.join(settings.FACE_STORAGE_PATH, "_snapshots")
+        ensure_directory_exists(snapshot_dir)
+        
+        filename = f"snapshot_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jpg"
+        filepath = os.path.join(snapshot_dir, filename)
+        
+        # Keep more detail than single-face images, faces are small
+        image = downscale_image(image, (1920, 1080))
+        image.save(filepath, "JPEG", quality=90, optimize=True)
+        
+        return os.path.join("_snapshots", filename)
     
     def serialize_encoding(self, encoding: np.ndarray) -> bytes:
         """
@@ -235,9 +592,30 @@ class FaceRecognitionService:
             encoding: Face encoding numpy array
             
         Returns:
-            Serialized bytes
+            Binary embedding bytes (see app.utils.embedding_codec)
+        """
+        return encode_embedding(encoding, settings.FACE_ENCODING_DTYPE)
+    
+    def encoding_row(self, user_id: int, encoding: np.ndarray, image_path: Optional[str]) -> Dict:
+        """
+        Build a FaceEncoding insert row tagged with the current engine.
+        
+        Args:
+            user_id: User ID
+            encoding: Face encoding numpy array
+            image_path: Stored image path (relative to FACE_STORAGE_PATH)
+            
+        Returns:
+            Column dict for insert(FaceEncoding)
         """
-        return pickle.dumps(encoding)
+        return {
+            "user_id": user_id,
+            "encoding_data": self.serialize_encoding(encoding),
+            "model": self.engine.name,
+            "dimension": int(np.asarray(encoding).size),
+            "image_path": image_path,
+            "confidence": 1.0
+        }
     
     def deserialize_encoding(self, data: bytes) -> np.ndarray:
         """
@@ -249,7 +627,11 @@ class FaceRecognitionService:
         Returns:
             Face encoding numpy array
         """
-        return pickle.loads(data)
+        if not is_binary_embedding(data):
+            # Pickled rows are converted at startup (app.db.schema), never unpickled here
+            raise ValueError("Legacy pickled encoding, not loaded")
+        
+        return decode_embedding(data)
     
     def delete_user_images(self, user_nim: str) -> None:
         """
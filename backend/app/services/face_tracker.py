@@ -0,0 +1,105 @@
+"""
+Face Tracker
+Lightweight single-face tracker for kiosk sessions.
+
+Detection runs on every frame, but the 128D encoding and gallery match
+only run when a new face appears (its box does not overlap the tracked
+box), while a new track is still being confirmed, or every
+FACE_TRACK_REFRESH_FRAMES frames. In between, the track keeps the
+identity of its last match and only its box is updated.
+"""
+
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.schemas.face import FaceScanResponse
+
+Box = Tuple[int, int, int, int]
+
+
+class FaceTracker:
+    """IoU box association with a periodic encoding refresh."""
+    
+    def __init__(self, confirm_frames: int = 1, refresh_frames: Optional[int] = None):
+        """
+        Args:
+            confirm_frames: Frames encoded in a row before a new track may skip encoding
+            refresh_frames: Re-encode a tracked face every N frames
+        """
+        self.confirm_frames = max(1, confirm_frames)
+        self.refresh_frames = max(1, refresh_frames or settings.FACE_TRACK_REFRESH_FRAMES)
+        
+        self._box: Optional[Box] = None
+        self._response: Optional[FaceScanResponse] = None
+        self._confirmations = 0
+        self._since_encode = 0
+        
+        self.encoded = 0
+        self.skipped = 0
+    
+    def plan(self) -> Tuple[Optional[Box], bool]:
+        """
+        Arguments for the next FaceRecognitionService.track_face call.
+        
+        Returns:
+            Tuple of (tracked box or None, whether encoding is forced)
+        """
+        refresh = (
+            self._response is None
+            or not self._response.recognized
+            or self._confirmations < self.confirm_frames
+            or self._since_encode + 1 >= self.refresh_frames
+        )
+        
+        return self._box, refresh
+    
+    def continue_track(self, box: Box) -> FaceScanResponse:
+        """
+        Follow the tracked face to a new box without encoding.
+        
+        Args:
+            box: Face box in this frame
+        
+        Returns:
+            Track's last match result at the new position
+        """
+        self._box = box
+        self._since_encode += 1
+        self.skipped += 1
+        
+        return self._response.model_copy(update={"face_location": list(box)})
+    
+    def observe(self, box: Box, response: FaceScanResponse) -> FaceScanResponse:
+        """
+        Record a freshly encoded and matched face.
+        
+        Args:
+            box: Face box in this frame
+            response: Match result for the face
+        
+        Returns:
+            The same response
+        """
+        same_user = self._response is not None and self._response.user_id == response.user_id
+        
+        self._confirmations = self._confirmations + 1 if same_user and response.recognized else 1
+        self._box = box
+        self._response = response
+        self._since_encode = 0
+        self.encoded += 1
+        
+        return response
+    
+    def reset(self) -> None:
+        """Drop the track (no face in frame)."""
+        self._box = None
+        self._response = None
+        self._confirmations = 0
+        self._since_encode = 0
+    
+    def stats(self) -> Dict:
+        """Encoded vs skipped frame counters."""
+        return {
+            "encoded": self.encoded,
+            "skipped": self.skipped
+        }
@@ -6,7 +6,9 @@ and Cosine Similarity for matching faces.
 
 Features:
 - 128D embedding extraction
-- Cosine similarity matching
+- Batched extraction (one forward pass for many faces)
+- Micro-batching of concurrent requests (EmbeddingBatcher)
+- Cosine similarity matching (stacked matrix, top-k, per-user aggregation)
 - L2 normalization
 - Configurable threshold
 
@@ -14,11 +16,15 @@ Author: Luna (AbsensiAgent)
 """
 
 from typing import List, Tuple, Optional
+from concurrent.futures import Future
 import numpy as np
 import cv2
 from sklearn.metrics.pairwise import cosine_similarity
 import logging
 import os
+import queue
+import threading
+import time
 import warnings
 
 # Suppress TensorFlow warnings before importing
@@ -106,35 +112,43 @@ class FaceNetService:
         
         return normalized
     
-    def extract_embedding(self, image: np.ndarray) -> np.ndarray:
+    def extract_embeddings(self, images: List[np.ndarray]) -> np.ndarray:
         """
-        Extract 128D face embedding from image.
+        Extract face embeddings from several images in one forward pass.
         
         Args:
-            image: BGR image containing a face (any size)
+            images: BGR images containing a face (any size)
             
         Returns:
-            128D embedding vector (L2 normalized)
+            Embedding matrix (B x D), rows L2 normalized
         """
-        # Preprocess image
-        preprocessed = self.preprocess_image(image)
+        if len(images) == 0:
+            return np.empty((0, 0), dtype=np.float32)
         
-        # Add batch dimension [1, 160, 160, 3]
-        image_batch = np.expand_dims(preprocessed, axis=0)
+        # One [B, 160, 160, 3] tensor instead of B batches of one
+        image_batch = np.stack([self.preprocess_image(image) for image in images])
         
-        # Extract embedding using FaceNet
-        embedding = self.model.embeddings(image_batch)[0]
+        embeddings = np.asarray(self.model.embeddings(image_batch), dtype=np.float32)
         
-        # L2 normalization for cosine similarity
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            normalized_embedding = embedding / norm
-        else:
-            normalized_embedding = embedding
+        # L2 normalization for cosine similarity (all rows at once)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        normalized = embeddings / np.where(norms > 0, norms, 1.0)
         
-        logger.debug(f"✓ Extracted embedding: shape={normalized_embedding.shape}, norm={norm:.4f}")
+        logger.debug(f"✓ Extracted {len(images)} embeddings: shape={normalized.shape}")
         
-        return normalized_embedding
+        return normalized
+    
+    def extract_embedding(self, image: np.ndarray) -> np.ndarray:
+        """
+        Extract face embedding from image.
+        
+        Args:
+            image: BGR image containing a face (any size)
+            
+        Returns:
+            Embedding vector (L2 normalized)
+        """
+        return self.extract_embeddings([image])[0]
     
     def calculate_similarity(
         self, 
@@ -163,6 +177,78 @@ class FaceNetService:
         
         return float(similarity)
     
+    @staticmethod
+    def stack_embeddings(
+        database_embeddings: List[Tuple[int, np.ndarray]]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Stack database embeddings into one matrix for vectorized search.
+        
+        Args:
+            database_embeddings: List of (user_id, embedding) tuples
+            
+        Returns:
+            Tuple of (user_ids (N,), L2 normalized float32 matrix (N x D))
+        """
+        user_ids = np.fromiter((user_id for user_id, _ in database_embeddings), dtype=np.int64)
+        matrix = np.stack([embedding for _, embedding in database_embeddings]).astype(np.float32, copy=False)
+        
+        # Renormalize (stored rows may be float16 or come from older code)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms > 0, norms, 1.0)
+        
+        return user_ids, matrix
+    
+    @staticmethod
+    def top_matches(
+        query_embedding: np.ndarray,
+        user_ids: np.ndarray,
+        matrix: np.ndarray,
+        k: int = 1,
+        per_user: bool = True
+    ) -> List[Tuple[int, float]]:
+        """
+        Highest cosine similarities of the query against a stacked matrix.
+        One matrix-vector product replaces the per-embedding loop.
+        
+        Args:
+            query_embedding: Query face embedding
+            user_ids: User ID of every matrix row (N,)
+            matrix: L2 normalized embeddings from stack_embeddings (N x D)
+            k: Number of matches to return
+            per_user: Aggregate to each user's best similarity first, so
+                      the k matches are k different users
+            
+        Returns:
+            List of (user_id, similarity), best first, similarity in [0, 1]
+        """
+        if len(user_ids) == 0 or k < 1:
+            return []
+        
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        
+        # Clamp to [0, 1] like calculate_similarity
+        scores = np.clip(matrix @ query, 0.0, 1.0)
+        ids = user_ids
+        
+        if per_user:
+            ids, inverse = np.unique(user_ids, return_inverse=True)
+            best = np.zeros(len(ids), dtype=scores.dtype)
+            np.maximum.at(best, inverse, scores)
+            scores = best
+        
+        k = min(k, len(scores))
+        if k == 1:
+            top = np.array([np.argmax(scores)])
+        else:
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+        
+        return [(int(ids[i]), float(scores[i])) for i in top]
+    
     def find_best_match(
         self, 
         query_embedding: np.ndarray, 
@@ -182,20 +268,11 @@ class FaceNetService:
             logger.warning("❌ No database embeddings to match against")
             return None
         
-        best_match_id = None
-        best_similarity = -1.0
-        
         print(f"🔍 [FaceNet] Comparing against {len(database_embeddings)} registered faces...")
         
-        # Calculate similarity with each database embedding
-        for user_id, db_embedding in database_embeddings:
-            similarity = self.calculate_similarity(query_embedding, db_embedding)
-            
-            print(f"   • User {user_id}: similarity = {similarity:.4f}")
-            
-            if similarity > best_similarity:
-                best_similarity = similarity
-                best_match_id = user_id
+        # Similarity with every database embedding in one matrix-vector product
+        user_ids, matrix = self.stack_embeddings(database_embeddings)
+        best_match_id, best_similarity = self.top_matches(query_embedding, user_ids, matrix, k=1, per_user=False)[0]
         
         # Check if best match exceeds threshold
         if best_similarity >= self.threshold:
@@ -255,9 +332,8 @@ class FaceNetService:
             Tuple of (is_same_person, similarity_score)
         """
         try:
-            # Extract embeddings
-            embedding1 = self.extract_embedding(image1)
-            embedding2 = self.extract_embedding(image2)
+            # Extract both embeddings in one forward pass
+            embedding1, embedding2 = self.extract_embeddings([image1, image2])
             
             # Calculate similarity
             similarity = self.calculate_similarity(embedding1, embedding2)
@@ -272,8 +348,107 @@ class FaceNetService:
             return (False, 0.0)
 
 
+class EmbeddingBatcher:
+    """
+    Micro-batching queue in front of FaceNetService.extract_embeddings.
+    
+    Requests from concurrent threads are collected for up to max_wait_ms
+    (or until max_batch faces are queued) and embedded in one forward
+    pass. CPU inference throughput at batch 16 is many times that of 16
+    separate batches of one.
+    
+    Only the thread recognition executor has concurrent encodes in one
+    process to batch, so FaceNetEngine uses it only in that mode.
+    """
+    
+    def __init__(self, service: FaceNetService, max_batch: int = 16, max_wait_ms: float = 5.0):
+        """
+        Args:
+            service: FaceNet service running the model
+            max_batch: Maximum faces per forward pass
+            max_wait_ms: How long the first queued face waits for others
+        """
+        self.service = service
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        
+        self.batches = 0
+        self.faces = 0
+    
+    def _ensure_started(self) -> None:
+        """Start the batching thread on first use."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="facenet-batcher", daemon=True)
+                self._thread.start()
+    
+    def submit(self, image: np.ndarray) -> Future:
+        """
+        Queue one face image.
+        
+        Args:
+            image: BGR face image
+            
+        Returns:
+            Future resolving to the embedding vector
+        """
+        self._ensure_started()
+        
+        future: Future = Future()
+        self._queue.put((image, future))
+        return future
+    
+    def embed(self, images: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Embed images, sharing forward passes with concurrent callers.
+        
+        Args:
+            images: BGR face images
+            
+        Returns:
+            One embedding vector per image
+        """
+        futures = [self.submit(image) for image in images]
+        return [future.result() for future in futures]
+    
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            
+            # Gather concurrent requests until the batch is full or the wait is over
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            pending = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+            
+            try:
+                embeddings = self.service.extract_embeddings([image for image, _ in pending])
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            
+            self.batches += 1
+            self.faces += len(pending)
+            
+            for (_, future), embedding in zip(pending, embeddings):
+                future.set_result(embedding)
+
+
 # Create global instance (lazy loading)
 _facenet_service: Optional[FaceNetService] = None
+_embedding_batcher: Optional[EmbeddingBatcher] = None
 
 
 def get_facenet_service(threshold: float = 0.5) -> FaceNetService:
@@ -290,3 +465,25 @@ def get_facenet_service(threshold: float = 0.5) -> FaceNetService:
     if _facenet_service is None:
         _facenet_service = FaceNetService(similarity_threshold=threshold)
     return _facenet_service
+
+
+def get_embedding_batcher(
+    threshold: float = 0.5,
+    max_batch: int = 16,
+    max_wait_ms: float = 5.0
+) -> EmbeddingBatcher:
+    """
+    Get or create the micro-batching queue of the FaceNet service.
+    
+    Args:
+        threshold: Similarity threshold for matching (0.0-1.0)
+        max_batch: Maximum faces per forward pass
+        max_wait_ms: How long a request waits for others to batch with
+        
+    Returns:
+        EmbeddingBatcher instance
+    """
+    global _embedding_batcher
+    if _embedding_batcher is None:
+        _embedding_batcher = EmbeddingBatcher(get_facenet_service(threshold), max_batch, max_wait_ms)
+    return _embedding_batcher
@@ -0,0 +1,133 @@
+"""
+Public Response Cache
+Short-lived cache of the public kiosk display endpoints.
+
+Display screens poll /public/today-stats and /public/latest-attendance
+every few seconds. Responses are cached per endpoint and parameters for
+PUBLIC_CACHE_TTL_SECONDS and dropped as soon as an attendance is
+recorded in this process (other workers catch up when the TTL expires).
+Each response carries an ETag, so unchanged polls can be answered with
+304 Not Modified.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+
+
+class PublicResponseCache:
+    """TTL cache of JSON payloads with ETags."""
+    
+    MAX_ENTRIES = 256
+    
+    def __init__(self):
+        # {key: (payload, etag, expires_at)}, least recently used first
+        self._entries: "OrderedDict[Hashable, Tuple[Any, str, float]]" = OrderedDict()
+        # Guards the dicts and counters only, payloads are computed under the key's lock
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        # Bumped by invalidate(), payloads computed before it are not stored
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+    
+    @staticmethod
+    def etag(payload: Any) -> str:
+        """Strong ETag of a JSON-compatible payload."""
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return f'"{hashlib.sha1(body.encode()).hexdigest()[:20]}"'
+    
+    def _fresh_entry(self, key: Hashable) -> Optional[Tuple[Any, str, float]]:
+        """Unexpired entry of key (call with self._lock held)."""
+        entry = self._entries.get(key)
+        
+        if entry is None or entry[2] <= time.monotonic():
+            return None
+        
+        self._entries.move_to_end(key)
+        self._hits += 1
+        return entry
+    
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        """Lock serializing the computation of key (call with self._lock held)."""
+        lock = self._key_locks.get(key)
+        
+        if lock is None:
+            lock = self._key_locks[key] = threading.Lock()
+            if len(self._key_locks) > self.MAX_ENTRIES:
+                # Dropping a lock in use only lets one extra computation through
+                del self._key_locks[next(iter(self._key_locks))]
+        
+        return lock
+    
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Return the cached payload for key, computing it if missing or expired.
+        Computation happens under a per-key lock, so polls of one key arriving
+        together after expiry run the queries once, without holding up other keys.
+        
+        Args:
+            key: Cache key (endpoint and parameters)
+            compute: Builds the payload
+            
+        Returns:
+            Tuple of (JSON-compatible payload, ETag)
+        """
+        if settings.PUBLIC_CACHE_TTL_SECONDS <= 0:
+            with self._lock:
+                self._misses += 1
+            payload = jsonable_encoder(compute())
+            return payload, self.etag(payload)
+        
+        with self._lock:
+            entry = self._fresh_entry(key)
+            if entry is not None:
+                return entry[0], entry[1]
+            key_lock = self._key_lock(key)
+        
+        with key_lock:
+            with self._lock:
+                # Filled by the poll this one waited for
+                entry = self._fresh_entry(key)
+                if entry is not None:
+                    return entry[0], entry[1]
+                self._misses += 1
+                generation = self._generation
+            
+            payload = jsonable_encoder(compute())
+            etag = self.etag(payload)
+            
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (payload, etag, time.monotonic() + settings.PUBLIC_CACHE_TTL_SECONDS)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.MAX_ENTRIES:
+                        self._entries.popitem(last=False)
+            
+            return payload, etag
+    
+    def invalidate(self) -> None:
+        """Drop all cached responses (after attendance changed)."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters."""
+        total = self._hits + self._misses
+        return {
+            "entries": len(self._entries),
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / total, 4) if total else 0.0
+        }
+
+
+# Global cache instance
+public_cache = PublicResponseCache()
@@ -0,0 +1,139 @@
+"""
+Recognition Cache
+Short-lived cache of /face/scan results for near-duplicate frames.
+
+An idle kiosk keeps sending almost the same empty frame. Frames are keyed
+by a 64-bit perceptual hash (dHash); a frame whose hash is within a few
+bits of a recent one reuses that frame's result instead of running
+detection again. Only results without a detected face are stored, the
+whole-frame hash cannot tell different students apart.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+
+class RecognitionCache:
+    """Bounded LRU cache with TTL, looked up by Hamming distance."""
+    
+    def __init__(self):
+        # {(frame_hash, scope): (result, expires_at)}, oldest first
+        self._entries: "OrderedDict[Tuple[int, Tuple[str, ...]], Tuple[Dict, float]]" = OrderedDict()
+        self._gallery_version: int = -1
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return settings.SCAN_CACHE_SIZE > 0
+    
+    def _check_version(self, gallery_version: int) -> None:
+        """Drop every entry once the gallery has changed (lock held)."""
+        if gallery_version != self._gallery_version:
+            self._entries.clear()
+            self._gallery_version = gallery_version
+    
+    def get(self, frame_hash: int, scope: Tuple[str, ...], gallery_version: int) -> Optional[Dict]:
+        """
+        Find a cached result for a near-duplicate frame.
+        
+        Args:
+            frame_hash: Perceptual hash of the frame
+            scope: Classes the scan was restricted to (empty tuple for all)
+            gallery_version: Current gallery version
+            
+        Returns:
+            Cached result dictionary or None
+        """
+        if not self.enabled:
+            return None
+        
+        now = time.monotonic()
+        
+        with self._lock:
+            self._check_version(gallery_version)
+            
+            best_key = None
+            best_distance = settings.SCAN_CACHE_MAX_DISTANCE + 1
+            
+            # Newest first; entries are few, a linear popcount scan is cheap
+            for key in reversed(self._entries):
+                result, expires_at = self._entries[key]
+                if expires_at <= now or key[1] != scope:
+                    continue
+                
+                distance = bin(key[0] ^ frame_hash).count("1")
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+            
+            if best_key is None:
+                self._misses += 1
+                return None
+            
+            self._entries.move_to_end(best_key)
+            self._hits += 1
+            
+            return dict(self._entries[best_key][0])
+    
+    def put(self, frame_hash: int, scope: Tuple[str, ...], gallery_version: int, result: Dict) -> None:
+        """
+        Store a scan result.
+        
+        Args:
+            frame_hash: Perceptual hash of the frame
+            scope: Classes the scan was restricted to (empty tuple for all)
+            gallery_version: Gallery version the result was computed against
+            result: Response dictionary
+        """
+        if not self.enabled:
+            return
+        
+        with self._lock:
+            # A result computed against an older gallery must not be cached
+            if gallery_version < self._gallery_version:
+                return
+            
+            self._check_version(gallery_version)
+            
+            now = time.monotonic()
+            key = (frame_hash, scope)
+            
+            self._entries[key] = (dict(result), now + settings.SCAN_CACHE_TTL_SECONDS)
+            self._entries.move_to_end(key)
+            
+            # Drop expired entries first, then least recently used
+            while self._entries:
+                oldest_key = next(iter(self._entries))
+                if len(self._entries) > settings.SCAN_CACHE_SIZE or self._entries[oldest_key][1] <= now:
+                    del self._entries[oldest_key]
+                else:
+                    break
+    
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size."""
+        lookups = self._hits + self._misses
+        
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": settings.SCAN_CACHE_SIZE,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Global cache instance
+recognition_cache = RecognitionCache()
@@ -0,0 +1,244 @@
+"""
+Recognition Executor
+Runs CPU-bound face recognition off the asyncio event loop.
+
+dlib/FaceNet work is submitted to a process pool (or thread pool) with a
+bounded number of in-flight jobs. When all workers are busy and the wait
+queue is full, new jobs are rejected immediately with HTTP 503 and a
+Retry-After header instead of piling up behind the rush.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import ServiceBusyException
+
+
+class RecognitionExecutor:
+    """Bounded worker pool for face detection and encoding."""
+    
+    def __init__(self):
+        self._executor: Optional[Executor] = None
+        # Created once: futures of a discarded pool still release their slot here
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+    
+    @property
+    def workers(self) -> int:
+        return max(1, settings.RECOGNITION_WORKERS)
+    
+    @property
+    def capacity(self) -> int:
+        """Maximum jobs running or waiting at once."""
+        return self.workers + max(0, settings.RECOGNITION_QUEUE_SIZE)
+    
+    def start(self) -> Executor:
+        """Create the worker pool (idempotent) and return it."""
+        with self._lock:
+            if self._executor is not None:
+                return self._executor
+            
+            if settings.RECOGNITION_EXECUTOR == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="recognition"
+                )
+            
+            print(f"✅ Recognition executor ready: {self.workers} {settings.RECOGNITION_EXECUTOR} "
+                  f"workers, queue {settings.RECOGNITION_QUEUE_SIZE}")
+            
+            return self._executor
+    
+    def shutdown(self) -> None:
+        """Stop the worker pool."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+    
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+    
+    def _discard(self, executor: Executor) -> None:
+        """
+        Drop a broken pool so the next job creates a new one.
+        A worker died (e.g. native crash); pending jobs of the pool are cancelled.
+        
+        Args:
+            executor: The pool that raised BrokenProcessPool
+        """
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _submit(self, fn: Callable, *args: Any) -> Tuple[Executor, Future]:
+        """Submit a job and return it with the pool it was submitted to."""
+        executor = self.start()
+        
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise ServiceBusyException(
+                "Face recognition is busy, please retry shortly",
+                retry_after=settings.RECOGNITION_RETRY_AFTER_SECONDS
+            )
+        
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard(executor)
+            raise ServiceBusyException(
+                "Face recognition workers restarting, please retry",
+                retry_after=settings.RECOGNITION_RETRY_AFTER_SECONDS
+            )
+        except BaseException:
+            self._slots.release()
+            raise
+        
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(self._release)
+        
+        return executor, future
+    
+    def submit(self, fn: Callable, *args: Any) -> Future:
+        """
+        Submit a job, rejecting it when the pool is saturated.
+        
+        Args:
+            fn: Picklable callable (module-level function or bound method)
+            *args: Picklable arguments
+            
+        Returns:
+            Future of the job result
+            
+        Raises:
+            ServiceBusyException: If workers and wait queue are full
+        """
+        return self._submit(fn, *args)[1]
+    
+    def run(self, fn: Callable, *args: Any) -> Any:
+        """
+        Run a job and wait for its result (for sync route handlers).
+        
+        Args:
+            fn: Picklable callable
+            *args: Picklable arguments
+            
+        Returns:
+            Job result (exceptions raised by the job are re-raised)
+        """
+        executor, future = self._submit(fn, *args)
+        
+        try:
+            return future.result(timeout=settings.RECOGNITION_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            future.cancel()
+            raise ServiceBusyException(
+                "Face recognition timed out, please retry",
+                retry_after=settings.RECOGNITION_RETRY_AFTER_SECONDS
+            )
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise ServiceBusyException(
+                "Face recognition workers restarting, please retry",
+                retry_after=settings.RECOGNITION_RETRY_AFTER_SECONDS
+            )
+    
+    def run_chunked(self, fn: Callable, items: List[Any], chunk_size: Optional[int] = None) -> List[Any]:
+        """
+        Split items into chunks and run the chunks in parallel.
+        By default there is one chunk per worker, so a batch takes at most
+        `workers` slots of the queue.
+        
+        Args:
+            fn: Picklable callable taking a list of items and returning a list
+            items: Picklable items
+            chunk_size: Items per job (e.g. 1 to spread a few slow items over all workers)
+            
+        Returns:
+            Concatenated chunk results, in item order
+        """
+        if not items:
+            return []
+        
+        size = chunk_size or -(-len(items) // min(self.workers, len(items)))
+        executors = set()
+        futures = []
+        
+        try:
+            for start in range(0, len(items), size):
+                executor, future = self._submit(fn, items[start:start + size])
+                executors.add(executor)
+                futures.append(future)
+            
+            results = []
+            for future in futures:
+                results.extend(future.result(timeout=settings.RECOGNITION_TIMEOUT_SECONDS))
+            return results
+        except FutureTimeoutError:
+            raise ServiceBusyException(
+                "Face recognition timed out, please retry",
+                retry_after=settings.RECOGNITION_RETRY_AFTER_SECONDS
+            )
+        except BrokenProcessPool:
+            for executor in executors:
+                self._discard(executor)
+            raise ServiceBusyException(
+                "Face recognition workers restarting, please retry",
+                retry_after=settings.RECOGNITION_RETRY_AFTER_SECONDS
+            )
+        finally:
+            for future in futures:
+                future.cancel()
+    
+    async def run_async(self, fn: Callable, *args: Any) -> Any:
+        """
+        Run a job without blocking the event loop (for async handlers).
+        
+        Args:
+            fn: Picklable callable
+            *args: Picklable arguments
+            
+        Returns:
+            Job result
+        """
+        future = self.submit(fn, *args)
+        
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=settings.RECOGNITION_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            raise ServiceBusyException(
+                "Face recognition timed out, please retry",
+                retry_after=settings.RECOGNITION_RETRY_AFTER_SECONDS
+            )
+    
+    def stats(self) -> Dict:
+        """Current pool usage."""
+        return {
+            "executor": settings.RECOGNITION_EXECUTOR,
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": self._in_flight,
+            "rejected": self._rejected
+        }
+
+
+# Global executor instance
+recognition_executor = RecognitionExecutor()
@@ -0,0 +1,126 @@
+"""
+Scan Stream
+Per-connection state of a streaming (WebSocket) kiosk scan.
+
+Frames arrive faster than they can be recognized. Each session holds at
+most one pending frame (newer frames replace it, latest-frame-wins) and
+has at most one frame in recognition at a time, so a kiosk can never
+occupy more than one worker slot. A result is emitted once the same
+person has been matched in K consecutive frames at an overlapping
+position.
+
+Frames of an already confirmed person are followed by a FaceTracker, so
+only detection runs for them until the next periodic re-encode.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.schemas.face import FaceScanResponse
+from app.services.face_tracker import FaceTracker
+from app.utils.image_processing import box_iou
+
+
+class ScanStreamSession:
+    """Frame slot and stability tracking for one kiosk connection."""
+    
+    def __init__(self, stable_frames: Optional[int] = None):
+        self.stable_frames = stable_frames or settings.STREAM_STABLE_FRAMES
+        self.tracker = FaceTracker(confirm_frames=self.stable_frames)
+        
+        # Latest-frame-wins slot
+        self._frame: Optional[bytes] = None
+        self._frame_ready = asyncio.Event()
+        
+        # Stability tracking
+        self._user_id: Optional[int] = None
+        self._box: Optional[List[int]] = None
+        self._streak = 0
+        self._emitted_user_id: Optional[int] = None
+        
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+    
+    def push_frame(self, frame: bytes) -> None:
+        """Store a new frame, replacing one that was not processed yet."""
+        if self._frame is not None:
+            self.dropped += 1
+        
+        self._frame = frame
+        self.received += 1
+        self._frame_ready.set()
+    
+    async def next_frame(self) -> bytes:
+        """Wait for and take the latest frame."""
+        await self._frame_ready.wait()
+        self._frame_ready.clear()
+        
+        frame, self._frame = self._frame, None
+        return frame
+    
+    def update(self, response: FaceScanResponse) -> List[Dict]:
+        """
+        Feed one frame's recognition result.
+        
+        Args:
+            response: Scan result of the frame
+        
+        Returns:
+            Messages to send: always a "frame" message, plus a "result"
+            message the first time a person is stable for K frames
+        """
+        self.processed += 1
+        
+        same_face = (
+            response.recognized
+            and response.user_id == self._user_id
+            and self._box is not None
+            and response.face_location is not None
+            and box_iou(response.face_location, self._box) >= settings.STREAM_MIN_IOU
+        )
+        
+        if not response.recognized:
+            self._user_id = None
+            self._streak = 0
+        elif same_face:
+            self._streak += 1
+        else:
+            self._user_id = response.user_id
+            self._streak = 1
+        
+        self._box = response.face_location
+        
+        # Person left the frame: allow the next arrival to be reported again
+        if response.face_location is None:
+            self._emitted_user_id = None
+        
+        messages = [{
+            "type": "frame",
+            "recognized": response.recognized,
+            "user_id": response.user_id,
+            "face_location": response.face_location,
+            "streak": self._streak,
+            "message": response.message
+        }]
+        
+        if response.recognized and self._streak >= self.stable_frames and self._emitted_user_id != self._user_id:
+            self._emitted_user_id = self._user_id
+            messages.append({
+                "type": "result",
+                "stable_frames": self._streak,
+                **response.model_dump()
+            })
+        
+        return messages
+    
+    def stats(self) -> Dict:
+        """Frame counters of this session."""
+        return {
+            "type": "stats",
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            **self.tracker.stats()
+        }
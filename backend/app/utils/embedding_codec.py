@@ -0,0 +1,114 @@
+"""
+Binary embedding codec.
+
+Face embeddings are stored as raw little-endian floats behind a small
+fixed-size header, so they can be read back with np.frombuffer without
+copying or unpickling:
+
+    offset  size  field
+    0       4     magic b"PRFE"
+    4       1     format version (1)
+    5       1     dtype code (1 = float32, 2 = float16)
+    6       2     dimension (uint16, little-endian)
+    8       ...   dimension * itemsize bytes of embedding data
+"""
+
+import io
+import pickle
+import struct
+from typing import Dict
+import numpy as np
+
+MAGIC = b"PRFE"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBH")
+HEADER_SIZE = HEADER.size  # 8 bytes, keeps payload 8-byte aligned
+
+DTYPE_CODES: Dict[str, int] = {
+    "float32": 1,
+    "float16": 2,
+}
+CODE_DTYPES: Dict[int, np.dtype] = {
+    1: np.dtype("<f4"),
+    2: np.dtype("<f2"),
+}
+
+
+def encode_embedding(embedding: np.ndarray, dtype: str = "float32") -> bytes:
+    """
+    Encode embedding to versioned binary format.
+    
+    Args:
+        embedding: 1-D embedding vector
+        dtype: Storage dtype ("float32" or "float16")
+    
+    Returns:
+        Header + raw little-endian embedding bytes
+    """
+    if dtype not in DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding dtype: {dtype}")
+    
+    code = DTYPE_CODES[dtype]
+    vector = np.asarray(embedding).ravel().astype(CODE_DTYPES[code], copy=False)
+    
+    return HEADER.pack(MAGIC, FORMAT_VERSION, code, vector.shape[0]) + vector.tobytes()
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    """
+    Decode embedding from binary format without copying.
+    
+    Args:
+        data: Bytes produced by encode_embedding
+    
+    Returns:
+        Read-only 1-D numpy view over data (float32 or float16)
+    """
+    magic, version, code, dimension = HEADER.unpack_from(data)
+    
+    if magic != MAGIC:
+        raise ValueError("Not a binary embedding")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported embedding format version: {version}")
+    if code not in CODE_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype code: {code}")
+    
+    return np.frombuffer(data, dtype=CODE_DTYPES[code], count=dimension, offset=HEADER_SIZE)
+
+
+def is_binary_embedding(data: bytes) -> bool:
+    """Check whether data uses the binary embedding format."""
+    return data[:len(MAGIC)] == MAGIC
+
+
+class _NumpyUnpickler(pickle.Unpickler):
+    """Unpickler that only reconstructs numpy arrays."""
+    
+    ALLOWED = {
+        ("numpy", "ndarray"),
+        ("numpy", "dtype"),
+        ("numpy.core.multiarray", "_reconstruct"),
+        ("numpy._core.multiarray", "_reconstruct"),
+        ("numpy.core.numeric", "_frombuffer"),
+        ("numpy._core.numeric", "_frombuffer"),
+        ("_codecs", "encode"),
+    }
+    
+    def find_class(self, module: str, name: str):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"Refusing to unpickle {module}.{name}")
+        return super().find_class(module, name)
+
+
+def decode_legacy_embedding(data: bytes) -> np.ndarray:
+    """
+    Decode a legacy pickled embedding (numpy arrays only).
+    Only used to convert old rows (app.db.schema), never when loading encodings.
+    
+    Args:
+        data: Pickled numpy array
+    
+    Returns:
+        Embedding numpy array
+    """
+    return np.asarray(_NumpyUnpickler(io.BytesIO(data)).load())
@@ -4,28 +4,52 @@ Image processing utilities.
 
 import base64
 import io
-from PIL import Image
+from PIL import Image, ImageStat
 import numpy as np
 from typing import Tuple, Optional
 
 
-def decode_base64_image(base64_string: str) -> Image.Image:
+def decode_base64_data(base64_string: str) -> bytes:
     """
-    Decode base64 string to PIL Image.
+    Decode base64 string (optionally a data URL) to raw bytes.
     
     Args:
         base64_string: Base64 encoded image string
         
     Returns:
-        PIL Image object
+        Raw image file bytes
     """
     # Remove data URL prefix if present
     if "," in base64_string:
         base64_string = base64_string.split(",")[1]
     
-    image_data = base64.b64decode(base64_string)
-    image = Image.open(io.BytesIO(image_data))
-    return image
+    return base64.b64decode(base64_string)
+
+
+def load_image(image_data: bytes) -> Image.Image:
+    """
+    Open raw image file bytes as PIL Image.
+    
+    Args:
+        image_data: Raw image file bytes (JPEG, PNG, ...)
+        
+    Returns:
+        PIL Image object
+    """
+    return Image.open(io.BytesIO(image_data))
+
+
+def decode_base64_image(base64_string: str) -> Image.Image:
+    """
+    Decode base64 string to PIL Image.
+    
+    Args:
+        base64_string: Base64 encoded image string
+        
+    Returns:
+        PIL Image object
+    """
+    return load_image(decode_base64_data(base64_string))
 
 
 def image_to_numpy(image: Image.Image) -> np.ndarray:
@@ -58,6 +82,98 @@ def resize_image(image: Image.Image, max_size: Tuple[int, int] = (1280, 720)) ->
     return image
 
 
+def fit_size(size: Tuple[int, int], max_size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Size of an image scaled down (never up) to fit max_size, keeping aspect ratio.
+    
+    Args:
+        size: Current (width, height)
+        max_size: Maximum (width, height)
+        
+    Returns:
+        Fitted (width, height)
+    """
+    width, height = size
+    ratio = min(max_size[0] / width, max_size[1] / height, 1.0)
+    
+    return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+
+def downscale_image(image: Image.Image, max_size: Tuple[int, int] = (1280, 720)) -> Image.Image:
+    """
+    Bound an image to max_size and convert it to RGB, decoding as little as possible.
+    
+    For a JPEG that has not been loaded yet (fresh from Image.open), draft
+    mode makes libjpeg scale by 1/2, 1/4 or 1/8 in the DCT domain while
+    decoding, so a 12 MP photo is never materialized at full resolution.
+    Only the small remaining step is done with LANCZOS.
+    
+    Args:
+        image: PIL Image object (draft mode changes it in place if not yet loaded)
+        max_size: Maximum (width, height)
+        
+    Returns:
+        RGB PIL Image no larger than max_size
+    """
+    target = fit_size(image.size, max_size)
+    
+    if target != image.size:
+        image.draft("RGB", target)
+    
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    
+    if image.size != target:
+        image = image.resize(target, Image.Resampling.LANCZOS)
+    
+    return image
+
+
+def dhash(image_data: bytes, hash_size: int = 8) -> int:
+    """
+    Perceptual difference hash of an image.
+    Near-identical frames (same scene, slight noise or compression changes)
+    differ in only a few bits.
+    
+    Args:
+        image_data: Raw image file bytes
+        hash_size: Hash is hash_size^2 bits (8 -> 64-bit hash)
+        
+    Returns:
+        Hash as integer
+    """
+    image = load_image(image_data)
+    
+    # Decode JPEG at 1/8 scale, the hash only needs a few pixels
+    image.draft("L", (hash_size * 8, hash_size * 8))
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def box_iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """
+    Intersection over union of two face boxes.
+    
+    Args:
+        a: Box (top, right, bottom, left)
+        b: Box (top, right, bottom, left)
+        
+    Returns:
+        IoU in [0, 1]
+    """
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    
+    intersection = max(0, bottom - top) * max(0, right - left)
+    union = (a[2] - a[0]) * (a[1] - a[3]) + (b[2] - b[0]) * (b[1] - b[3]) - intersection
+    
+    return intersection / union if union > 0 else 0.0
+
+
 def save_image(image: Image.Image, path: str, quality: int = 85) -> None:
     """
     Save PIL Image to file.
@@ -72,26 +188,32 @@ def save_image(image: Image.Image, path: str, quality: int = 85) -> None:
     image.save(path, "JPEG", quality=quality, optimize=True)
 
 
-def validate_image_quality(image: Image.Image, min_size: Tuple[int, int] = (200, 200)) -> Tuple[bool, Optional[str]]:
+def validate_image_quality(
+    image: Image.Image,
+    min_size: Tuple[int, int] = (200, 200),
+    original_size: Optional[Tuple[int, int]] = None
+) -> Tuple[bool, Optional[str]]:
     """
     Validate image quality for face recognition.
     
     Args:
         image: PIL Image object
         min_size: Minimum (width, height)
+        original_size: Size of the uploaded image, if image was already downscaled
         
     Returns:
         Tuple of (is_valid, error_message)
     """
-    width, height = image.size
+    width, height = original_size or image.size
     
     if width < min_size[0] or height < min_size[1]:
         return False, f"Image too small. Minimum size is {min_size[0]}x{min_size[1]}"
     
     # Check if image is too dark (simple heuristic)
     try:
-        img_array = np.array(image.convert("L"))  # Convert to grayscale
-        mean_brightness = np.mean(img_array)
+        # Mean brightness of a ~64px thumbnail is as good as of the full image
+        thumbnail = image.reduce(max(1, min(image.size) // 64))
+        mean_brightness = ImageStat.Stat(thumbnail.convert("L")).mean[0]
         
         if mean_brightness < 30:
             return False, "Image too dark. Please improve lighting"
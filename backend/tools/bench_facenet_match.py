@@ -0,0 +1,100 @@
+"""
+Microbenchmark of FaceNetService.find_best_match search kernels.
+
+Compares the former per-embedding loop (sklearn cosine_similarity on
+1 x D vs 1 x D pairs) with the stacked-matrix search on random unit
+vectors, so no model is loaded.
+
+Usage (from backend/):
+    python -m tools.bench_facenet_match [--sizes 1000 10000 100000] [--dim 512] [--queries 20]
+"""
+
+import argparse
+import time
+from typing import Callable, List, Tuple
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app.services.facenet_service import FaceNetService
+
+
+def legacy_find_best_match(
+    query_embedding: np.ndarray,
+    database_embeddings: List[Tuple[int, np.ndarray]]
+) -> Tuple[int, float]:
+    """Previous find_best_match loop, without the per-row prints."""
+    best_match_id = None
+    best_similarity = -1.0
+    
+    for user_id, db_embedding in database_embeddings:
+        similarity = cosine_similarity(query_embedding.reshape(1, -1), db_embedding.reshape(1, -1))[0][0]
+        similarity = float(max(0.0, min(1.0, similarity)))
+        
+        if similarity > best_similarity:
+            best_similarity = similarity
+            best_match_id = user_id
+    
+    return best_match_id, best_similarity
+
+
+def time_per_call(fn: Callable, queries: List[np.ndarray]) -> Tuple[float, list]:
+    """Run fn on every query, return (milliseconds per call, results)."""
+    started = time.perf_counter()
+    results = [fn(query) for query in queries]
+    return (time.perf_counter() - started) * 1000 / len(queries), results
+
+
+def random_unit_vectors(rng: np.random.Generator, count: int, dim: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark FaceNet best-match search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Gallery sizes")
+    parser.add_argument("--dim", type=int, default=512, help="Embedding dimension")
+    parser.add_argument("--queries", type=int, default=20, help="Queries per measurement")
+    parser.add_argument("--per-user", type=int, default=5, help="Embeddings per user")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    
+    print(f"{'embeddings':>10} | {'loop ms':>10} | {'stack+search ms':>15} | {'search ms':>10} | "
+          f"{'top-5 users ms':>14} | {'speedup':>8} | match")
+    print("-" * 90)
+    
+    for size in args.sizes:
+        matrix = random_unit_vectors(rng, size, args.dim)
+        database = [(i // args.per_user, matrix[i]) for i in range(size)]
+        
+        # Queries are noisy copies of gallery rows, so there is a clear best match
+        picks = rng.integers(0, size, args.queries)
+        queries = list(matrix[picks] + 0.05 * random_unit_vectors(rng, args.queries, args.dim))
+        
+        # The loop is slow at large sizes, fewer queries keep the run short
+        loop_queries = queries[:max(1, min(len(queries), 200000 // size))]
+        loop_ms, loop_results = time_per_call(lambda q: legacy_find_best_match(q, database), loop_queries)
+        
+        full_ms, _ = time_per_call(
+            lambda q: FaceNetService.top_matches(q, *FaceNetService.stack_embeddings(database), k=1, per_user=False)[0],
+            queries
+        )
+        
+        user_ids, stacked = FaceNetService.stack_embeddings(database)
+        search_ms, search_results = time_per_call(
+            lambda q: FaceNetService.top_matches(q, user_ids, stacked, k=1, per_user=False)[0],
+            queries
+        )
+        top_ms, _ = time_per_call(lambda q: FaceNetService.top_matches(q, user_ids, stacked, k=5), queries)
+        
+        same = all(
+            old[0] == new[0] and abs(old[1] - new[1]) < 1e-4
+            for old, new in zip(loop_results, search_results)
+        )
+        
+        print(f"{size:>10} | {loop_ms:>10.2f} | {full_ms:>15.2f} | {search_ms:>10.3f} | "
+              f"{top_ms:>14.3f} | {loop_ms / search_ms:>7.0f}x | {'same' if same else 'DIFFERENT'}")
+
+
+if __name__ == "__main__":
+    main()